@@ -1,7 +1,39 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from file_utils import save_json, load_txt_into_set
 import re
+import numpy as np
 from config import Directories
+from space_saving import SpaceSaving
+from lexicon import FORMS, load_lexicon
+
+
+def merge_counts(counts, other_counts):
+    """
+    Add counts from one dictionary to another.
+    New keys are appended in their order, so merging partial counts
+    in the input order gives the same dictionary as counting serially.
+    """
+    for key, count in other_counts.items():
+        if key in counts:
+            counts[key] += count
+        else:
+            counts[key] = count
+
+
+def count_values(counts, values):
+    """
+    Add occurrences of values from an array to a dictionary of counts.
+    New keys are appended in the order of their first occurrence,
+    so the dictionary is the same as when counting the values one by one.
+    """
+    if len(values) == 0:
+        return
+    keys, first_indexes, key_counts = \
+        np.unique(values, return_index=True, return_counts=True)
+    order = np.argsort(first_indexes)
+    merge_counts(counts, dict(zip(keys[order].tolist(),
+                                  key_counts[order].tolist())))
 
 
 class Analysis(ABC):
@@ -12,6 +44,10 @@ class Analysis(ABC):
     and then the results are eventually written to a file.
     """
 
+    # whether the analysis reads authors and repos of the commits, names
+    # are loaded only for such analyses, the others get None instead
+    uses_names = False
+
     @property
     @abstractmethod
     def name(self):
@@ -22,13 +58,28 @@ class Analysis(ABC):
     def analyze_commit(self, author, repo, lines, message):
         """
         Run the analysis on a commit.
-        :param author: commit author (GitHub username)
-        :param repo: repository name
+        :param author: commit author (GitHub username),
+            None unless the analysis uses_names
+        :param repo: repository name, None unless the analysis uses_names
         :param lines: number of lines of the commit message
         :param message: commit message
         """
         pass
 
+    def analyze_batch(self, authors, repos, lines, messages):
+        """
+        Run the analysis on a batch of commits.
+        By default, analyze_commit() is called on every commit,
+        analyses can override it to process the whole batch at once.
+        :param authors: commit authors
+        :param repos: repository names
+        :param lines: numbers of lines of the commit messages
+        :param messages: commit messages
+        """
+        for author, repo, commit_lines, message in \
+                zip(authors, repos, lines, messages):
+            self.analyze_commit(author, repo, commit_lines, message)
+
     @property
     @abstractmethod
     def state(self):
@@ -40,6 +91,17 @@ class Analysis(ABC):
         """
         pass
 
+    def merge(self, other):
+        """
+        Merge a partial state of another analysis of the same type.
+        It's used for running the analysis on parts of the input in parallel.
+        Analyses of the parts are merged in the order of the parts
+        and neither of them should be finalized.
+        :param other: analysis of the following part of the input
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} doesn't support merging")
+
     def finalize(self):
         """
         Do final computations.
@@ -56,16 +118,47 @@ class Analysis(ABC):
         save_json(self.state, f"{Directories.json_outputs}/{self.name}.json")
 
 
+@lru_cache(maxsize=1)
+def load_stopwords():
+    """
+    Load the stopwords just once, partial analyses (e.g. rollups of hours)
+    are unpickled without them and share them.
+    """
+    return frozenset(load_txt_into_set(f"{Directories.raw_data}/stopwords.txt"))
+
+
 class WordFrequencyAnalysis(Analysis):
-    def __init__(self):
-        self.words = {}
-        self.stopwords =\
-            load_txt_into_set(f"{Directories.raw_data}/stopwords.txt")
+    def __init__(self, max_words=None):
+        """
+        :param max_words: if set, count the words only approximately using
+            at most about twice this many counters (see SpaceSaving),
+            the most frequent words then get their maximal error
+            in the results, which also have the total number of words;
+            it bounds memory, not time (counting is about as fast as
+            exact counting)
+        """
+        self.words = {} if max_words is None else SpaceSaving(max_words)
+        self.stopwords = load_stopwords()
+
+    def __getstate__(self):
+        # stopwords are the same for all instances, so partial analyses
+        # (e.g. rollups of hours) aren't bigger by them
+        state = self.__dict__.copy()
+        del state['stopwords']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stopwords = load_stopwords()
 
     @property
     def name(self):
         return 'word_frequency'
 
+    @property
+    def approximate(self):
+        return isinstance(self.words, SpaceSaving)
+
     def analyze_commit(self, author, repo, lines, message):
         words = message.split(" ")
         for word in words:
@@ -73,12 +166,36 @@ class WordFrequencyAnalysis(Analysis):
             if word == "" or word in self.stopwords:
                 continue
 
-            if word in self.words:
-                self.words[word] += 1
-            else:
-                self.words[word] = 1
+            self.count_word(word)
+
+    def count_word(self, word):
+        if self.approximate:
+            self.words.add(word)
+        elif word in self.words:
+            self.words[word] += 1
+        else:
+            self.words[word] = 1
+
+    def merge(self, other):
+        if self.approximate:
+            self.words.merge(other.words)
+        else:
+            merge_counts(self.words, other.words)
 
     def finalize(self):
+        if self.approximate:
+            # only the top words are kept and their counts are overestimated,
+            # so the total of all words is saved with them
+            counter = self.words
+            sorted_keys = counter.most_common()
+            self.words = {'total': counter.total,
+                          'error_bound': counter.error_bound,
+                          'words': [{'word': word,
+                                     'count': counter.counts[word],
+                                     'error': counter.errors[word]}
+                                    for word in sorted_keys]}
+            return
+
         sorted_keys = sorted(self.words, key=self.words.get, reverse=True)
         self.words = [{'word': word, 'count': self.words[word]}
                       for word in sorted_keys]
@@ -97,25 +214,19 @@ class FirstWordFrequencyAnalysis(WordFrequencyAnalysis):
         words = message.split(" ")
         word = words[0].lower()
 
-        if word in self.words:
-            self.words[word] += 1
-        else:
-            self.words[word] = 1
+        self.count_word(word)
 
 
 class VerbFormAnalysis(Analysis):
+    # finds where the message continues after a prefix like "fix:"
+    # (group 1) and after a tag like "[core]" (group 2) in a single scan
+    PREFIXES = re.compile(r"(?=(.*:\s*)?)(?=(\[.*\]\s*)?)")
+
     def __init__(self):
-        self.forms = [
-            'imperative',
-            'gerund',
-            'third_person',
-            'past_tense'
-        ]
-
-        self.lists = {}
-        for form in self.forms:
-            self.lists[form] =\
-                load_txt_into_set(f"{Directories.processed_data}/{form}.txt")
+        self.forms = list(FORMS)
+
+        # word -> form (generated by generate_conjugations.py)
+        self.lexicon = load_lexicon()
 
         self.counts = {}
         for form in self.forms:
@@ -126,26 +237,52 @@ class VerbFormAnalysis(Analysis):
         for form in self.forms:
             self.frequencies[form] = {}
 
+    def __getstate__(self):
+        # the lexicon is big and the same for all instances, so it isn't
+        # pickled (e.g. when sending analyses to other processes)
+        state = self.__dict__.copy()
+        del state['lexicon']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lexicon = load_lexicon()
+
     @property
     def name(self):
         return 'verb_form'
 
     def analyze_commit(self, author, repo, lines, message):
-        word = message.split(" ")[0].lower()
-        if not self.analyze_word(word):
-            word = re.sub("^.*:\s*", "", message).split(" ")[0].lower()
-            if not self.analyze_word(word):
-                word = re.sub("^\[.*\]\s*", "", message).split(" ")[0].lower()
-                if not self.analyze_word(word):
-                    self.counts['non_verb'] += 1
-
-    def analyze_word(self, word):
-        for form in self.forms:
-            if word in self.lists[form]:
-                self.counts[form] += 1
-                self.count_frequency(word, form)
-                return True
-        return False
+        classified = self.classify(message)
+        if classified:
+            word, form = classified
+            self.counts[form] += 1
+            self.count_frequency(word, form)
+        else:
+            self.counts['non_verb'] += 1
+
+    def classify(self, message):
+        """
+        Find the verb form of the first word of a message.
+        If the first word is not a verb, the first word after a prefix
+        (like "fix:") is tried, and then the first word after a tag
+        (like "[core]").
+        :return: tuple of (word, form) or None if there is no verb
+        """
+        word = message.split(" ", 1)[0].lower()
+        form = self.lexicon.get(word)
+        if form:
+            return word, form
+
+        match = self.PREFIXES.match(message)
+        for end in match.end(1), match.end(2):
+            if end > 0:
+                word = message[end:].split(" ", 1)[0].lower()
+                form = self.lexicon.get(word)
+                if form:
+                    return word, form
+
+        return None
 
     def count_frequency(self, word, form):
         if word in self.frequencies[form]:
@@ -153,6 +290,11 @@ class VerbFormAnalysis(Analysis):
         else:
             self.frequencies[form][word] = 1
 
+    def merge(self, other):
+        merge_counts(self.counts, other.counts)
+        for form in self.forms:
+            merge_counts(self.frequencies[form], other.frequencies[form])
+
     def sort_frequencies(self):
         for form in self.forms:
             sorted_keys = sorted(
@@ -192,6 +334,13 @@ class MessageLengthAnalysis(Analysis):
         else:
             self.lengths[length] = 1
 
+    def analyze_batch(self, authors, repos, lines, messages):
+        count_values(self.lengths,
+                     np.fromiter(map(len, messages), np.int64, len(messages)))
+
+    def merge(self, other):
+        merge_counts(self.lengths, other.lengths)
+
     @property
     def state(self):
         return self.lengths
@@ -211,21 +360,28 @@ class MessageLineCountAnalysis(Analysis):
         else:
             self.lineCounts[lines] = 1
 
+    def analyze_batch(self, authors, repos, lines, messages):
+        count_values(self.lineCounts, np.asarray(lines, np.int64))
+
+    def merge(self, other):
+        merge_counts(self.lineCounts, other.lineCounts)
+
     @property
     def state(self):
         return self.lineCounts
 
 
 class BinaryAnalyses(Analysis):
-    def __init__(self):
-        self.analyses = {
-            'total': lambda x: True,
-            'capital_letter': lambda x: x[0].isupper(),
-            'full_stop': lambda x: x[-1] == ".",
-            'capslock': lambda x: all(c.isupper() for c in x),
-            'non_ascii_chars': lambda x: any(ord(c) > 128 for c in x)
-        }
+    # a class attribute, so that instances can be pickled
+    analyses = {
+        'total': lambda x: True,
+        'capital_letter': lambda x: x[0].isupper(),
+        'full_stop': lambda x: x[-1] == ".",
+        'capslock': lambda x: all(c.isupper() for c in x),
+        'non_ascii_chars': lambda x: any(ord(c) > 128 for c in x)
+    }
 
+    def __init__(self):
         self.counts = {}
         for analysis in self.analyses:
             self.counts[analysis] = 0
@@ -240,6 +396,63 @@ class BinaryAnalyses(Analysis):
                 if self.analyses[analysis](message):
                     self.counts[analysis] += 1
 
+    def analyze_batch(self, authors, repos, lines, messages):
+        """
+        Run the analyses on a batch of messages at once.
+
+        The messages are encoded into one byte buffer and the checks
+        are done with NumPy over bytes. A byte of a multi-byte UTF-8
+        character is never an ASCII byte, so the checks are exact
+        for ASCII, and the few messages with other characters
+        are checked the same way as in analyze_commit().
+        """
+        encoded = [message.encode() for message in messages if message]
+        if not encoded:
+            return
+        data = np.frombuffer(b"".join(encoded), np.uint8)
+        ends = np.cumsum(np.fromiter(map(len, encoded), np.int64,
+                                     len(encoded)))
+        starts = np.concatenate(([0], ends[:-1]))
+
+        first = data[starts]
+        non_ascii = np.logical_or.reduceat(data >= 0x80, starts)
+        capslock = np.logical_and.reduceat((data >= 0x41) & (data <= 0x5a),
+                                           starts)
+
+        self.counts['total'] += len(encoded)
+        self.counts['capital_letter'] += \
+            int(np.count_nonzero((first >= 0x41) & (first <= 0x5a)))
+        self.counts['full_stop'] += \
+            int(np.count_nonzero(data[ends - 1] == ord(".")))
+        self.counts['capslock'] += int(np.count_nonzero(capslock))
+
+        for i in np.flatnonzero(non_ascii).tolist():
+            message = encoded[i].decode()
+            if first[i] >= 0x80 and self.analyses['capital_letter'](message):
+                self.counts['capital_letter'] += 1
+            if self.analyses['capslock'](message):
+                self.counts['capslock'] += 1
+            if self.analyses['non_ascii_chars'](message):
+                self.counts['non_ascii_chars'] += 1
+
+    def merge(self, other):
+        merge_counts(self.counts, other.counts)
+
     @property
     def state(self):
         return self.counts
+
+
+def all_analyses(max_words=None):
+    """
+    Create all the analyses run by analyze.py.
+    :param max_words: see WordFrequencyAnalysis
+    """
+    return [
+        WordFrequencyAnalysis(max_words),
+        FirstWordFrequencyAnalysis(max_words),
+        VerbFormAnalysis(),
+        MessageLengthAnalysis(),
+        MessageLineCountAnalysis(),
+        BinaryAnalyses(),
+    ]
@@ -0,0 +1,138 @@
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from time import gmtime, strftime
+
+from config import Directories, Analyzing
+from file_utils import save_json
+
+
+class AnalysisProfiler:
+    """
+    Instrumentation of Analyzer (enabled by analyze.py --profile).
+
+    It records cumulative wall time of every analysis (analyzing commits,
+    finalizing and saving), time of reading commits, throughput,
+    numbers of skipped commits (over the limit of commits by author)
+    and peaks of memory allocated by Python (traced by tracemalloc).
+    A progress line is printed every Analyzing.profile_interval seconds
+    and the profile is saved into outputs/json/profile.json.
+    """
+
+    METHODS = ['analyze', 'finalize', 'save']
+
+    def __init__(self, analyses, interval=Analyzing.profile_interval,
+                 trace_memory=True):
+        """
+        :param analyses: list of the profiled analyses
+        :param interval: number of seconds between progress lines
+        :param trace_memory: whether to trace memory by tracemalloc
+            (it makes the analysis considerably slower)
+        """
+        self.times = {analysis.name: dict.fromkeys(self.METHODS, 0.0)
+                      for analysis in analyses}
+        self.reading_time = 0.0
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.intervals = []
+
+        self.start_time = None
+        self.last_report = None
+        self.last_total_number = 0
+        self.memory_peak = 0
+
+    def start(self):
+        self.start_time = self.last_report = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def measure(self, analysis, method):
+        """Add the time spent in the block to a method of an analysis."""
+        start = time.perf_counter()
+        yield
+        self.times[analysis.name][method] += time.perf_counter() - start
+
+    def measure_reading(self, chunks):
+        """Wrap an iterable of chunks, measuring the time of reading them."""
+        chunks = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            self.reading_time += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+
+    def add_times(self, times, reading_time):
+        """Add times measured by a profiler of another process."""
+        for name, methods in times.items():
+            for method, seconds in methods.items():
+                self.times[name][method] += seconds
+        self.reading_time += reading_time
+
+    def update(self, total_number, analyzed_number):
+        """Report the progress if the interval has passed since the last one."""
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.report(now, total_number, analyzed_number)
+
+    def report(self, now, total_number, analyzed_number):
+        speed = (total_number - self.last_total_number) \
+            / max(now - self.last_report, 1e-9)
+        memory_peak = 0
+        if self.trace_memory:
+            _, memory_peak = tracemalloc.get_traced_memory()
+            # the peak of an interval needs Python 3.9, older versions
+            # report the peak since the start
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory_peak = max(self.memory_peak, memory_peak)
+
+        self.intervals.append({
+            'seconds': now - self.start_time,
+            'commits': total_number,
+            'analyzed': analyzed_number,
+            'skipped': total_number - analyzed_number,
+            'commits_per_second': speed,
+            'memory_peak_mib': memory_peak / 2**20,
+        })
+
+        time_of_day = strftime("%H:%M:%S", gmtime())
+        memory = f", memory peak {memory_peak / 2**20:.1f} MiB" \
+            if self.trace_memory else ""
+        print(f"[{time_of_day}] {total_number:,} commits ({speed:,.0f}/s),"
+              f" {analyzed_number:,} analyzed,"
+              f" {total_number - analyzed_number:,} skipped{memory}")
+        sys.stdout.flush()
+
+        self.last_report = now
+        self.last_total_number = total_number
+
+    def finish(self, total_number, analyzed_number):
+        """Report the final numbers and save the profile."""
+        now = time.perf_counter()
+        self.report(now, total_number, analyzed_number)
+        if self.trace_memory:
+            tracemalloc.stop()
+
+        elapsed = now - self.start_time
+        profile = {
+            'seconds': elapsed,
+            'commits': total_number,
+            'analyzed': analyzed_number,
+            'skipped': total_number - analyzed_number,
+            'commits_per_second': total_number / max(elapsed, 1e-9),
+            'reading_seconds': self.reading_time,
+            'analyses': self.times,
+            'memory_peak_mib': self.memory_peak / 2**20
+            if self.trace_memory else None,
+            'intervals': self.intervals,
+        }
+        save_json(profile, f"{Directories.json_outputs}/profile.json")
+
+        print(f"Reading commits: {self.reading_time:.2f} s")
+        for name, methods in self.times.items():
+            print(f"{name:22}" + "".join(f" {method} {seconds:7.2f} s"
+                                         for method, seconds in methods.items()))
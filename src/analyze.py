@@ -1,12 +1,61 @@
 #!/usr/bin/env python3
+import argparse
+
 from analyzer import Analyzer
-from analyses import *
+from analyses import all_analyses
+from config import Analyzing
+from shard_index import check_date
+from time_buckets import GRANULARITIES
+
+parser = argparse.ArgumentParser(description="Analyze fetched commits.")
+parser.add_argument('processes', type=int, nargs='?',
+                    default=Analyzing.processes,
+                    help="number of processes to run the analyses in")
+parser.add_argument('--incremental', action='store_true',
+                    help="analyze only commits fetched since the previous"
+                         " incremental run and add them to its results")
+parser.add_argument('--max-words', type=int,
+                    help="count words approximately in bounded memory,"
+                         " using at most this many counters")
+parser.add_argument('--chunk-size', type=int, default=Analyzing.chunk_size,
+                    help="number of commits given to the analyses at once")
+parser.add_argument('--profile', action='store_true',
+                    help="measure time and memory of the analyses and save"
+                         " them into outputs/json/profile.json")
+parser.add_argument('--buckets', choices=GRANULARITIES,
+                    default=Analyzing.buckets,
+                    help="also save time series of the results"
+                         " with this granularity")
+parser.add_argument('--since',
+                    help="analyze only commits pushed since this date"
+                         " (yyyy, yyyy-mm or yyyy-mm-dd)")
+parser.add_argument('--until',
+                    help="analyze only commits pushed until this date"
+                         " (included)")
+parser.add_argument('--rollups', action='store_true',
+                    help="also save partial analyses of every hour, day and"
+                         " month into outputs/rollups, so that any range"
+                         " of dates can be reported by report.py")
+args = parser.parse_args()
+if args.incremental and args.buckets:
+    parser.error("time series can't be analyzed incrementally")
+if args.incremental and (args.since or args.until):
+    parser.error("a date range can't be analyzed incrementally")
+for date in args.since, args.until:
+    if date:
+        try:
+            check_date(date)
+        except ValueError as error:
+            parser.error(str(error))
+common_length = min(len(args.since or ""), len(args.until or ""))
+if args.since and args.until \
+        and args.since[:common_length] > args.until[:common_length]:
+    parser.error(f"--since {args.since} is after --until {args.until}")
+if args.rollups and (args.buckets or args.since or args.until):
+    parser.error("rollups are made of all commits by hours,"
+                 " without time series or a date range")
 
-Analyzer([
-    WordFrequencyAnalysis(),
-    FirstWordFrequencyAnalysis(),
-    VerbFormAnalysis(),
-    MessageLengthAnalysis(),
-    MessageLineCountAnalysis(),
-    BinaryAnalyses(),
-]).analyze()
+Analyzer(all_analyses(args.max_words), args.processes,
+         incremental=args.incremental, chunk_size=args.chunk_size,
+         profile=args.profile, buckets=args.buckets, since=args.since,
+         until=args.until, rollups=args.rollups).analyze()
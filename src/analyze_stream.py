@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import argparse
+import threading
+from queue import Queue
+
+from analyzer import Analyzer
+from analyses import all_analyses
+from config import Analyzing, Fetching
+from deduplication import CommitDeduplicator
+from time_buckets import GRANULARITIES
+from fetch_manifest import FetchManifest
+from fetch_commits import create_archive_cache, FetchError
+from fetch_scheduler import hours_of_month, fetch_commits_for_hours
+
+
+def stream_commits(hours, workers=Fetching.workers, save=False):
+    """
+    Fetch commits in a background thread and yield them as they come.
+
+    Fetched hours are passed through a queue of at most
+    Analyzing.stream_queue_size hours, so fetching waits when
+    the analysis can't keep up (and memory stays bounded).
+    Commits seen earlier in the stream are dropped (if Fetching.deduplicate)
+    and their number is reported at the end.
+    :param hours: iterable of hours in yyyy-mm-dd-hh format
+    :param workers: number of archives downloaded at the same time
+    :param save: also save the commits into the commit store
+        (hours that are already there are not saved again)
+    :return: generator of commits, see fetch_commits()
+    """
+    queue = Queue(Analyzing.stream_queue_size)
+    finished = object()
+    deduplicator = CommitDeduplicator() if Fetching.deduplicate else None
+    duplicates = 0
+
+    def fetch():
+        nonlocal duplicates
+        try:
+            manifest = FetchManifest() if save else None
+            for date, commits in fetch_commits_for_hours(
+                    hours, workers, create_archive_cache()):
+                try:
+                    commits = list(commits)
+                except FetchError as error:
+                    print(f"{error}, skipping.")
+                    continue
+                if manifest and not manifest.is_done(date):
+                    manifest.save(date, commits)
+                if deduplicator:
+                    commits, dropped = deduplicator.deduplicate(commits)
+                    deduplicator.add(commits, 0)
+                    duplicates += dropped
+                queue.put(commits)
+        except Exception as error:
+            queue.put(error)
+        else:
+            queue.put(finished)
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+
+    while True:
+        commits = queue.get()
+        if commits is finished:
+            break
+        if isinstance(commits, Exception):
+            raise commits
+        yield from commits
+
+    thread.join()
+    if duplicates:
+        print(f"Dropped {duplicates} duplicate commits.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Fetch commits of a month (or a day) and analyze them"
+                    " while they are being downloaded.")
+    parser.add_argument('year', type=int)
+    parser.add_argument('month', type=int)
+    parser.add_argument('day', type=int, nargs='?',
+                        help="analyze just this day of the month")
+    parser.add_argument('--workers', type=int, default=Fetching.workers,
+                        help="number of archives downloaded at the same time")
+    parser.add_argument('--save', action='store_true',
+                        help="also save the commits into the commit store")
+    parser.add_argument('--max-words', type=int,
+                        help="count words approximately in bounded memory,"
+                             " using at most this many counters")
+    parser.add_argument('--chunk-size', type=int,
+                        default=Analyzing.chunk_size,
+                        help="number of commits given to the analyses at once")
+    parser.add_argument('--profile', action='store_true',
+                        help="measure time and memory of the analyses and"
+                             " save them into outputs/json/profile.json")
+    parser.add_argument('--buckets', choices=GRANULARITIES,
+                        default=Analyzing.buckets,
+                        help="also save time series of the results"
+                             " with this granularity")
+    args = parser.parse_args()
+
+    if args.day:
+        hours = [f"{args.year}-{args.month:02}-{args.day:02}-{hour}"
+                 for hour in range(0, 24)]
+    else:
+        hours = hours_of_month(args.year, args.month)
+
+    analyzer = Analyzer(all_analyses(args.max_words), processes=1,
+                        chunk_size=args.chunk_size, profile=args.profile,
+                        buckets=args.buckets)
+    analyzer.analyze_stream(stream_commits(hours, args.workers, args.save))
@@ -1,38 +1,444 @@
-from config import Directories
+import os
+import pickle
+from array import array
+from contextlib import contextmanager
+from itertools import chain, islice
+from multiprocessing import Pool
+
+from config import Directories, Analyzing
+from analysis_profiler import AnalysisProfiler
+from commit_store import CommitStore
+from fetch_manifest import FetchManifest
+from rollups import Rollups
+from shard_index import ShardIndex
+from time_buckets import TimeBuckets
+
+
+@contextmanager
+def not_measured():
+    """Block that isn't profiled (contextlib.nullcontext needs Python 3.7)."""
+    yield
 
 
 class Analyzer:
     """Class that reads commits and runs analyses on them."""
 
-    def __init__(self, analyses):
+    def __init__(self, analyses, processes=Analyzing.processes, store=None,
+                 incremental=False, chunk_size=Analyzing.chunk_size,
+                 profile=False, buckets=Analyzing.buckets, since=None,
+                 until=None, rollups=False):
+        """
+        :param analyses: list of analyses to run
+        :param processes: number of processes to run the analyses in,
+            the results are the same as when running in a single one
+        :param store: CommitStore to read the commits from
+        :param incremental: continue from the state saved by the previous
+            incremental run, i.e. analyze only commits fetched since then
+        :param chunk_size: number of commits read and given to the analyses
+            at once (see Analysis.analyze_batch())
+        :param profile: measure time and memory of the analyses,
+            see AnalysisProfiler
+        :param buckets: granularity of time series of the results
+            (see TimeBuckets), None means no time series
+        :param since: analyze only commits pushed since this date
+            (yyyy, yyyy-mm or yyyy-mm-dd), only the shards of the date range
+            are read (see ShardIndex), the limit of commits by author
+            then applies to commits of the range
+        :param until: analyze only commits pushed until this date (included)
+        :param rollups: also save partial analyses of every hour, day
+            and month, so that any range of dates can be reported
+            without analyzing the commits again (see Rollups)
+        """
+        if incremental and buckets:
+            raise ValueError("Time series can't be analyzed incrementally.")
+        if incremental and (since or until):
+            raise ValueError("A date range can't be analyzed incrementally.")
+        if rollups and (buckets or since or until):
+            raise ValueError("Rollups are made of all commits by hours,"
+                             " without time series or a date range.")
+
         self.analyses = analyses
-        self.authors = {}
+        self.processes = processes
+        self.store = store if store is not None else CommitStore()
+        self.incremental = incremental
+        self.since = since
+        self.until = until
+        self.chunk_size = chunk_size
+        self.profiler = AnalysisProfiler(analyses) if profile else None
+        self.rollups = Rollups() if rollups else None
+        # rollups are made of the analyses of hours
+        granularity = 'hour' if rollups else buckets
+        self.time_buckets = TimeBuckets(pickle.dumps(analyses), granularity) \
+            if granularity else None
+        # numbers of analyzed commits by author ID, see limit_authors()
+        self.authors = bytearray()
         self.total_number = 0
         self.analyzed_number = 0
 
         self.MAX_COMMITS_BY_AUTHOR = 3
+        assert self.MAX_COMMITS_BY_AUTHOR < 256
+
+        self.state_path = f"{Directories.json_outputs}/analysis_state.pickle"
 
     def analyze(self):
-        file = open(f"{Directories.processed_data}/commits.txt")
-        with file:
-            for line in file:
-                try:
-                    [author, repo, lines, message] = line.split("::", 3)
-                    if author not in self.authors:
-                        self.authors[author] = 0
-                    if self.authors[author] < self.MAX_COMMITS_BY_AUTHOR:
-                        message = message.strip()
-                        for analysis in self.analyses:
-                            analysis.analyze_commit(author, repo, lines, message)
-                        self.authors[author] += 1
-                        self.analyzed_number += 1
-                except ValueError:
-                    print("ValueError, skipping.")
-                self.total_number += 1
+        # pickled before loading the state, workers need empty analyses
+        empty_analyses = pickle.dumps(self.analyses)
+
+        start = self.load_state() if self.incremental else 0
+        names = [analysis.name for analysis in self.analyses]
+        if self.rollups and start == 0:
+            self.rollups.clear()
+        elif self.rollups \
+                and self.rollups.position(self.store.id, names) != start:
+            raise ValueError("Rollups don't match the saved state, analyze"
+                             " the commits with rollups non-incrementally.")
+        manifest = FetchManifest(self.store, recover=False)
+        end = manifest.length
+        ranges = [(start, end)]
+        if self.incremental:
+            print(f"Analyzing {end - start} new commits.")
+        if self.since or self.until:
+            ranges = ShardIndex(manifest).select(self.since, self.until)
+            print(f"Analyzing {sum(end - start for start, end in ranges)}"
+                  f" commits from {self.since or 'the start'}"
+                  f" until {self.until or 'the end'}.")
+        if self.profiler:
+            self.profiler.start()
+
+        if self.processes > 1:
+            self.analyze_in_parallel(empty_analyses, ranges)
+        else:
+            self.analyze_chunks(chain.from_iterable(
+                self.store.read_chunks(start, end, self.chunk_size)
+                for start, end in ranges))
+
+        if self.incremental:
+            self.save_state(end)
+        if self.rollups:
+            self.rollups.update(self.time_buckets, self.store.id, names, end)
+
+        self.save_results()
+
+    def analyze_stream(self, commits):
+        """
+        Run the analyses on commits that aren't in the commit store
+        (e.g. coming straight from the fetcher) and save the results.
+        :param commits: iterable of (author, repo, lines, message, time, sha)
+            tuples
+        """
+        author_ids = {}
+        repo_ids = {}
+        author_names = []
+        repo_names = []
+
+        def intern(ids, names, name):
+            if name not in ids:
+                ids[name] = len(names)
+                names.append(name)
+            return ids[name]
+
+        if self.profiler:
+            self.profiler.start()
+
+        commits = iter(commits)
+        while True:
+            chunk = list(islice(commits, self.chunk_size))
+            if not chunk:
+                break
 
+            authors = array('I', [intern(author_ids, author_names, commit[0])
+                                  for commit in chunk])
+            repos = array('I', [intern(repo_ids, repo_names, commit[1])
+                                for commit in chunk])
+            lines = array('I', [commit[2] for commit in chunk])
+            messages = [commit[3] for commit in chunk]
+            times = array('I', [commit[4] for commit in chunk])
+
+            self.authors.extend(bytes(len(author_names) - len(self.authors)))
+            self.analyze_chunk(authors, repos, lines, messages, times,
+                               author_names, repo_names)
+            if self.profiler:
+                self.profiler.update(self.total_number, self.analyzed_number)
+
+        self.save_results()
+
+    def save_results(self):
         for analysis in self.analyses:
-            analysis.finalize()
-            analysis.save()
+            with self.measure(analysis, 'finalize'):
+                analysis.finalize()
+            with self.measure(analysis, 'save'):
+                analysis.save()
+        if self.time_buckets and not self.rollups:
+            self.time_buckets.save()
 
         print(f"Analyzed {self.analyzed_number} commits"
               f" (out of {self.total_number}).")
+        if self.profiler:
+            self.profiler.finish(self.total_number, self.analyzed_number)
+
+    def measure(self, analysis, method):
+        """Measure a call of an analysis method if profiling."""
+        if self.profiler:
+            return self.profiler.measure(analysis, method)
+        return not_measured()
+
+    def limit_authors(self):
+        """
+        Prepare the table of numbers of analyzed commits of authors.
+
+        Authors are interned by the commit store, so their IDs go from zero
+        and a byte per author is enough (instead of a dictionary entry
+        with the author name, that's about 100 bytes). The authors are
+        counted without loading their names.
+        """
+        missing = self.store.name_count('authors') - len(self.authors)
+        if missing > 0:
+            self.authors.extend(bytes(missing))
+
+    def analyze_chunks(self, chunks):
+        """
+        Run the analyses on chunks of commits.
+        :param chunks: iterable of (author IDs, repo IDs, lines, messages,
+            times) tuples, see CommitStore.read_chunks()
+        """
+        self.limit_authors()
+        if self.profiler:
+            chunks = self.profiler.measure_reading(chunks)
+
+        for chunk in chunks:
+            self.analyze_chunk(*chunk)
+            if self.profiler:
+                self.profiler.update(self.total_number, self.analyzed_number)
+
+    def analyze_chunk(self, authors, repos, lines, messages, times,
+                      author_names=None, repo_names=None):
+        """
+        Select commits of authors under the limit from a chunk
+        and give them to every analysis at once. Names of authors and repos
+        are resolved only if an analysis uses them (see Analysis.uses_names),
+        so the tables of names aren't loaded otherwise.
+        :param author_names: names of the author IDs (default is the store's)
+        :param repo_names: names of the repo IDs (default is the store's)
+        """
+        selected = []
+        for i, author in enumerate(authors):
+            count = self.authors[author]
+            if count < self.MAX_COMMITS_BY_AUTHOR:
+                self.authors[author] = count + 1
+                selected.append(i)
+        self.total_number += len(authors)
+        self.analyzed_number += len(selected)
+        if not selected:
+            return
+
+        if any(analysis.uses_names for analysis in self.analyses):
+            if author_names is None:
+                author_names = self.store.author_names
+            if repo_names is None:
+                repo_names = self.store.repo_names
+            authors = [author_names[authors[i]] for i in selected]
+            repos = [repo_names[repos[i]] for i in selected]
+        else:
+            authors = repos = [None] * len(selected)
+        if len(selected) < len(messages):
+            lines = [lines[i] for i in selected]
+            messages = [messages[i] for i in selected]
+            times = [times[i] for i in selected]
+
+        for analysis in self.analyses:
+            with self.measure(analysis, 'analyze'):
+                analysis.analyze_batch(authors, repos, lines, messages)
+        if self.time_buckets:
+            self.time_buckets.analyze_batch(times, authors, repos, lines,
+                                            messages)
+
+    def save_state(self, position):
+        """
+        Save the raw (not finalized) state of the analyses
+        and the position in the commit store up to which commits are analyzed.
+        """
+        state = {
+            'store': self.store.id,
+            'position': position,
+            'names': [analysis.name for analysis in self.analyses],
+            'analyses': self.analyses,
+            'authors': self.authors,
+            'total_number': self.total_number,
+            'analyzed_number': self.analyzed_number,
+        }
+
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".part"
+        file = open(temp_path, 'wb')
+        with file:
+            pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.state_path)
+
+    def load_state(self):
+        """
+        Load the state saved by save_state() (if there's a matching one).
+        :return: position in the commit store to continue from
+        """
+        if not os.path.exists(self.state_path):
+            return 0
+
+        file = open(self.state_path, 'rb')
+        with file:
+            state = pickle.load(file)
+
+        names = [analysis.name for analysis in self.analyses]
+        if state['store'] != self.store.id or state['names'] != names \
+                or state['position'] > len(self.store):
+            print("Saved state doesn't match the commits or the analyses,"
+                  " analyzing all commits.")
+            return 0
+
+        for analysis, saved_analysis in zip(self.analyses, state['analyses']):
+            analysis.merge(saved_analysis)
+        self.authors = state['authors']
+        self.total_number = state['total_number']
+        self.analyzed_number = state['analyzed_number']
+
+        return state['position']
+
+    def analyze_in_parallel(self, empty_analyses, ranges):
+        """
+        Split ranges of commits into chunks and analyze them in a process pool.
+
+        Only the first MAX_COMMITS_BY_AUTHOR commits of each author are
+        analyzed, so a chunk has to know how many commits of its authors
+        have been analyzed in the previous chunks. Therefore, commits
+        of each author are counted in every chunk first and the chunks
+        are analyzed only after the counts from the previous chunks are known.
+        Partial analyses are then merged in the order of the chunks.
+        :param empty_analyses: pickled analyses before analyzing anything
+        :param ranges: sorted list of (start, end) ranges of commits
+        """
+        chunks = split_ranges(ranges, self.processes * 4)
+        self.limit_authors()
+        if not chunks:
+            return
+
+        with Pool(self.processes) as pool:
+            counted_chunks = pool.imap(
+                _count_authors,
+                [(self.store.directory, start, end, self.MAX_COMMITS_BY_AUTHOR)
+                 for start, end in chunks]
+            )
+
+            results = []
+            for (start, end), counts in zip(chunks, counted_chunks):
+                previous_counts = {author: self.authors[author]
+                                   for author in counts
+                                   if self.authors[author] > 0}
+                results.append(pool.apply_async(
+                    _analyze_chunk,
+                    [empty_analyses, self.store.directory, start, end,
+                     previous_counts, self.chunk_size, bool(self.profiler),
+                     self.time_buckets and self.time_buckets.granularity]
+                ))
+
+                for author, count in counts.items():
+                    self.authors[author] = min(
+                        self.authors[author] + count,
+                        self.MAX_COMMITS_BY_AUTHOR
+                    )
+
+            for result in results:
+                analyses, analyzed_number, total_number, profile, \
+                    time_buckets = result.get()
+                for analysis, partial_analysis in zip(self.analyses, analyses):
+                    with self.measure(analysis, 'analyze'):
+                        analysis.merge(partial_analysis)
+                self.analyzed_number += analyzed_number
+                self.total_number += total_number
+                if time_buckets:
+                    self.time_buckets.merge(time_buckets)
+                if self.profiler:
+                    self.profiler.add_times(*profile)
+                    self.profiler.update(self.total_number,
+                                         self.analyzed_number)
+
+
+def split_into_chunks(start, end, chunk_count):
+    """
+    Split a range of commits into ranges of (nearly) the same size.
+    :param start: position of the first commit
+    :param end: position after the last commit
+    :param chunk_count: maximal number of chunks
+    :return: list of (start, end) tuples
+    """
+    boundaries = [start + (end - start) * i // chunk_count
+                  for i in range(chunk_count + 1)]
+    return [(start, end)
+            for start, end in zip(boundaries, boundaries[1:])
+            if start < end]
+
+
+def split_ranges(ranges, chunk_count):
+    """
+    Split ranges of commits (e.g. shards, see ShardIndex) into chunks
+    of nearly the same size. A chunk never spans more ranges.
+    :param ranges: list of (start, end) tuples
+    :param chunk_count: approximate maximal number of chunks
+    :return: list of (start, end) tuples
+    """
+    total = sum(end - start for start, end in ranges)
+    if total == 0:
+        return []
+    chunks = []
+    for start, end in ranges:
+        count = max(1, round((end - start) * chunk_count / total))
+        chunks += split_into_chunks(start, end, count)
+    return chunks
+
+
+# commit stores opened in a worker process (so names are loaded just once)
+_stores = {}
+
+
+def _open_store(directory):
+    if directory not in _stores:
+        _stores[directory] = CommitStore(directory)
+    return _stores[directory]
+
+
+def _count_authors(args):
+    """Count commits of each author in a chunk (up to the limit)."""
+    directory, start, end, limit = args
+    counts = {}
+    for author in _open_store(directory).read_column('authors', start, end):
+        counts[author] = min(counts.get(author, 0) + 1, limit)
+    return counts
+
+
+def _analyze_chunk(analyses, directory, start, end, previous_counts,
+                   chunk_size, profile, buckets):
+    """
+    Analyze a chunk.
+    :param analyses: pickled list of analyses
+    :param previous_counts: number of analyzed commits in the previous chunks
+        for authors from this chunk
+    :param profile: measure time of the analyses
+    :param buckets: granularity of time series or None
+    :return: tuple of (analyses, analyzed_number, total_number, profile,
+        time_buckets) where profile is a tuple of (times, reading time)
+        or None and time_buckets are TimeBuckets or None
+    """
+    store = _open_store(directory)
+    analyzer = Analyzer(pickle.loads(analyses), processes=1, store=store,
+                        chunk_size=chunk_size, buckets=buckets)
+    analyzer.limit_authors()
+    for author, count in previous_counts.items():
+        analyzer.authors[author] = count
+    if profile:
+        # memory isn't traced and progress isn't reported in workers
+        analyzer.profiler = AnalysisProfiler(
+            analyzer.analyses, interval=float('inf'), trace_memory=False)
+        analyzer.profiler.start()
+    analyzer.analyze_chunks(store.read_chunks(start, end, chunk_size))
+
+    profile = (analyzer.profiler.times, analyzer.profiler.reading_time) \
+        if profile else None
+    return analyzer.analyses, analyzer.analyzed_number, \
+        analyzer.total_number, profile, analyzer.time_buckets
@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import Directories, Fetching
+
+
+class ArchiveCache:
+    """
+    On-disk cache of raw hourly archives (the .json.gz files).
+
+    Archives are keyed by hour. When the total size of the cache exceeds
+    the limit, the least recently used archives are deleted.
+    It's safe to use the cache from multiple threads.
+    """
+
+    def __init__(self, directory=Directories.archives,
+                 max_size=Fetching.cache_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        # hour -> size, ordered from the least recently used
+        self.archives = OrderedDict()
+        os.makedirs(self.directory, exist_ok=True)
+        entries = [entry for entry in os.scandir(self.directory)
+                   if entry.name.endswith(".json.gz")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            hour = entry.name[:-len(".json.gz")]
+            self.archives[hour] = entry.stat().st_size
+
+    def path(self, hour):
+        return f"{self.directory}/{hour}.json.gz"
+
+    def hours(self):
+        """Get all cached hours."""
+        with self.lock:
+            return list(self.archives)
+
+    def open(self, hour):
+        """
+        Open a cached archive and mark it as recently used.
+        :param hour: hour in yyyy-mm-dd-hh format
+        :return: binary file or None if the hour is not cached
+        """
+        with self.lock:
+            if hour not in self.archives:
+                return None
+            self.archives.move_to_end(hour)
+            os.utime(self.path(hour))
+            return open(self.path(hour), 'rb')
+
+    @contextmanager
+    def store(self, hour, file):
+        """
+        Wrap a downloaded archive so that it's stored into the cache
+        while it's being read.
+        The archive is added only if it has been read completely.
+        :param hour: hour in yyyy-mm-dd-hh format
+        :param file: binary file-like object (e.g. HTTP response)
+        :return: context manager of a file-like object to read instead
+        """
+        temp_path = f"{self.path(hour)}.{threading.get_ident()}.part"
+        temp_file = open(temp_path, 'wb')
+        reader = _TeeReader(file, temp_file)
+        try:
+            with temp_file:
+                yield reader
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        if not reader.finished:
+            os.remove(temp_path)
+            return
+
+        os.replace(temp_path, self.path(hour))
+        with self.lock:
+            self.archives[hour] = os.path.getsize(self.path(hour))
+            self.archives.move_to_end(hour)
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used archives above the size limit."""
+        total_size = sum(self.archives.values())
+        while total_size > self.max_size and len(self.archives) > 1:
+            hour, size = self.archives.popitem(last=False)
+            os.remove(self.path(hour))
+            total_size -= size
+
+
+class _TeeReader:
+    """File-like object that copies everything it reads into another file."""
+
+    def __init__(self, file, copy):
+        self.file = file
+        self.copy = copy
+        self.finished = False
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        if data:
+            self.copy.write(data)
+        elif size != 0:
+            self.finished = True
+        return data
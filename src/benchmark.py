@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+from benchmark_utils import CorpusGenerator
+from config import Directories, Analyzing, Fetching
+
+
+def generate_corpus(directory, hours, events_per_hour, seed=0):
+    """
+    Generate synthetic hourly archives (see CorpusGenerator).
+    :param directory: directory to create the .json.gz files in
+    :param hours: list of hours in yyyy-mm-dd-hh format
+    :param events_per_hour: number of events in an archive
+    :return: number of commits in all the archives
+    """
+    generator = CorpusGenerator(seed)
+    return sum(generator.archive(os.path.join(directory, f"{hour}.json.gz"),
+                                 hour, events_per_hour)
+               for hour in hours)
+
+
+class FixtureServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server with a thread per request (like ThreadingHTTPServer)."""
+    daemon_threads = True
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """
+    Handler serving files of `root` instead of the working directory
+    (the directory argument of SimpleHTTPRequestHandler needs Python 3.7).
+    """
+    root = None
+
+    def translate_path(self, path):
+        path = os.path.relpath(super().translate_path(path), os.getcwd())
+        return os.path.join(self.root, path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def fixture_server(directory):
+    """
+    Serve files of a directory over HTTP on a random local port.
+    :return: context manager of the URL of the server
+    """
+    handler = type('FixtureHandler', (QuietHandler,), {'root': directory})
+    server = FixtureServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def peak_rss():
+    """Peak resident set size of the current process in MiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_fetch(url, store_directory, hours, workers):
+    from config import GithubArchive
+    from commit_store import CommitStore
+    from fetch_manifest import FetchManifest
+    from fetch_scheduler import fetch_commits_for_hours
+
+    GithubArchive.url = url
+    manifest = FetchManifest(CommitStore(store_directory))
+
+    start = time.perf_counter()
+    for date, commits in fetch_commits_for_hours(hours, workers):
+        manifest.save(date, commits)
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'commits': manifest.length,
+            'peak_rss_mib': peak_rss()}
+
+
+def benchmark_analyze(store_directory, json_directory, processes, chunk_size):
+    from analyzer import Analyzer
+    from analyses import all_analyses
+    from commit_store import CommitStore
+
+    Directories.json_outputs = json_directory
+    analyzer = Analyzer(all_analyses(), processes,
+                        store=CommitStore(store_directory),
+                        chunk_size=chunk_size)
+
+    start = time.perf_counter()
+    analyzer.analyze()
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'commits': analyzer.total_number,
+            'peak_rss_mib': peak_rss()}
+
+
+def benchmark_analyses(store_directory, json_directory, chunk_size):
+    """Measure time spent in every analysis (in a single process)."""
+    from analyzer import Analyzer
+    from analyses import all_analyses
+    from commit_store import CommitStore
+
+    Directories.json_outputs = json_directory
+    analyses = all_analyses()
+    times = {analysis.name: 0 for analysis in analyses}
+
+    def timed(analysis, method):
+        def run(*args):
+            start = time.perf_counter()
+            method(*args)
+            times[analysis.name] += time.perf_counter() - start
+        return run
+
+    for analysis in analyses:
+        analysis.analyze_batch = timed(analysis, analysis.analyze_batch)
+
+    store = CommitStore(store_directory)
+    analyzer = Analyzer(analyses, 1, store=store, chunk_size=chunk_size)
+    analyzer.analyze_chunks(store.read_chunks(0, len(store), chunk_size))
+    for analysis in analyses:
+        timed(analysis, analysis.finalize)()
+        timed(analysis, analysis.save)()
+    return times
+
+
+def benchmark_plot(json_directory, charts_directory):
+    from plot import plot
+    from plotters import all_plotters
+
+    Directories.json_outputs = json_directory
+    Directories.charts = charts_directory
+
+    start = time.perf_counter()
+    plot(all_plotters(), force=True)
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'peak_rss_mib': peak_rss()}
+
+
+def run_stage(results, function, args):
+    """Run a stage and put its result (or its exception) into a queue."""
+    try:
+        results.put((True, function(*args)))
+    except BaseException as e:
+        results.put((False, e))
+        raise
+
+
+def run_in_process(function, *args):
+    """
+    Run a stage in a new process, so that its peak memory is its own.
+    The process isn't a daemon (like workers of a pool are),
+    so the stage can start processes of its own (e.g. Analyzer).
+    :return: result of the function
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_stage,
+                              args=(results, function, args))
+    process.start()
+    try:
+        while True:
+            try:
+                succeeded, result = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"{function.__name__} exited with"
+                                       f" code {process.exitcode}.")
+    finally:
+        process.join()
+    if not succeeded:
+        raise result
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    hours = [f"2017-01-01-{hour}" for hour in range(args.hours)]
+    results = {
+        'revision': git_revision(),
+        'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'parameters': vars(args),
+        'stages': {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        archives = os.path.join(directory, "archives")
+        store = os.path.join(directory, "commits")
+        json_outputs = os.path.join(directory, "json")
+        charts = os.path.join(directory, "charts")
+        os.makedirs(archives)
+        os.makedirs(charts)
+
+        print(f"Generating {args.hours} archives"
+              f" with {args.events:,} events each...")
+        results['corpus_commits'] = \
+            generate_corpus(archives, hours, args.events, args.seed)
+
+        with fixture_server(archives) as url:
+            results['stages']['fetch'] = run_in_process(
+                benchmark_fetch, url, store, hours, args.workers)
+        results['stages']['analyze'] = run_in_process(
+            benchmark_analyze, store, json_outputs, args.processes,
+            args.chunk_size)
+        results['analyses'] = run_in_process(
+            benchmark_analyses, store, json_outputs, args.chunk_size)
+        if not args.skip_plot:
+            results['stages']['plot'] = run_in_process(
+                benchmark_plot, json_outputs, charts)
+
+    for stage in results['stages'].values():
+        if 'commits' in stage:
+            stage['commits_per_second'] = stage['commits'] / stage['seconds']
+    return results
+
+
+def print_results(results, previous=None):
+    """Print results, compared with previous ones if they are given."""
+    def compare(value, previous_value):
+        if previous_value is None:
+            return ""
+        return f" ({value / previous_value:5.2f}x of previous)"
+
+    previous_stages = previous['stages'] if previous else {}
+    previous_analyses = previous['analyses'] if previous else {}
+
+    for name, stage in results['stages'].items():
+        previous_stage = previous_stages.get(name, {})
+        print(f"{name:8} {stage['seconds']:8.2f} s"
+              f"{compare(stage['seconds'], previous_stage.get('seconds'))}"
+              f"  {stage['peak_rss_mib']:8.1f} MiB peak RSS"
+              f"{compare(stage['peak_rss_mib'], previous_stage.get('peak_rss_mib'))}")
+        if 'commits_per_second' in stage:
+            print(f"{'':8} {stage['commits_per_second']:10,.0f} commits/s")
+
+    for name, seconds in results['analyses'].items():
+        print(f"  {name:22} {seconds:8.2f} s"
+              f"{compare(seconds, previous_analyses.get(name))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark fetching, analyzing and plotting"
+                    " on a synthetic corpus served locally.")
+    parser.add_argument('--hours', type=int, default=4,
+                        help="number of hourly archives")
+    parser.add_argument('--events', type=int, default=50000,
+                        help="number of events in an archive")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=Fetching.workers)
+    parser.add_argument('--processes', type=int, default=Analyzing.processes)
+    parser.add_argument('--chunk-size', type=int, default=Analyzing.chunk_size)
+    parser.add_argument('--skip-plot', action='store_true')
+    parser.add_argument('--output',
+                        help="path of the JSON results (default is"
+                             " outputs/benchmarks/<date>.json)")
+    parser.add_argument('--compare',
+                        help="path of previous JSON results to compare with")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_results(results, previous)
+
+    output = args.output or \
+        f"{Directories.outputs}/benchmarks/{results['date']}.json"
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved into {output}.")
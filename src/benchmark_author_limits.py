@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import random
+import sys
+import tempfile
+
+from analyzer import Analyzer
+from benchmark_utils import traced
+from commit_store import CommitStore
+
+
+def generate_store(directory, author_count, commit_count, seed=0):
+    """
+    Generate a commit store whose authors follow a long-tail distribution.
+    :param author_count: number of distinct authors
+    :param commit_count: number of commits
+    :return: number of distinct authors of the commits
+    """
+    rng = random.Random(seed)
+    store = CommitStore(directory)
+    distinct = set()
+    for start in range(0, commit_count, CommitStore.BLOCK_SIZE):
+        authors = [min(int(rng.paretovariate(0.5)) - 1, author_count - 1)
+                   if rng.random() < 0.5 else rng.randrange(author_count)
+                   for _ in range(min(CommitStore.BLOCK_SIZE,
+                                      commit_count - start))]
+        distinct.update(authors)
+        store.append((f"user-{author}", "user/repo", 1, "Fix", 0, None)
+                     for author in authors)
+    return len(distinct)
+
+
+def benchmark_author_limits(author_count, commit_count, limit=3):
+    """
+    Compare peak memory of analyzing commits of a store with tables
+    of numbers of analyzed commits of authors.
+    Every variant reads the commits from the store, only the dictionary
+    by name loads the names of the authors (the default analyses don't
+    use them, so the Analyzer doesn't load them either).
+    :param author_count: number of distinct authors
+    :param commit_count: number of commits
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        distinct = generate_store(directory, author_count, commit_count)
+        print(f"{author_count:,} authors, {commit_count:,} commits"
+              f" ({distinct:,} distinct authors)")
+
+        def dictionary_by_name():
+            store = CommitStore(directory)
+            names = store.author_names
+            table = {}
+            for authors, _, _, _, _ in store.read_chunks():
+                for author in authors:
+                    name = names[author]
+                    if name not in table:
+                        table[name] = 0
+                    if table[name] < limit:
+                        table[name] += 1
+            return table
+
+        def dictionary_by_id():
+            store = CommitStore(directory)
+            table = {}
+            for authors, _, _, _, _ in store.read_chunks():
+                for author in authors:
+                    count = table.get(author, 0)
+                    if count < limit:
+                        table[author] = count + 1
+            return table
+
+        def analyzer():
+            store = CommitStore(directory)
+            analyzer = Analyzer([], 1, store=store, buckets=None)
+            analyzer.analyze_chunks(store.read_chunks())
+            return analyzer.authors
+
+        for name, build in [("dict by name (old)", dictionary_by_name),
+                            ("dict by ID", dictionary_by_id),
+                            ("Analyzer (bytearray by ID)", analyzer)]:
+            _, _, peak = traced(build)
+            print(f"{name:28} {peak / 2**20:10.1f} MiB")
+
+
+if __name__ == '__main__':
+    authors = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    benchmark_author_limits(authors, authors * 2)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import pickle
+import sys
+
+from analyses import BinaryAnalyses, MessageLengthAnalysis, \
+    MessageLineCountAnalysis
+from benchmark_utils import Checks, CorpusGenerator, speedup, timed
+
+
+def analyze(analysis, commits, batch_size):
+    if batch_size:
+        for i in range(0, len(commits), batch_size):
+            batch = commits[i:i + batch_size]
+            analysis.analyze_batch(None, None,
+                                   [lines for lines, _ in batch],
+                                   [message for _, message in batch])
+    else:
+        for lines, message in commits:
+            analysis.analyze_commit(None, None, lines, message)
+    analysis.finalize()
+
+
+def benchmark(batch_size):
+    commits = CorpusGenerator().commits(500000)
+    checks = Checks()
+    for analysis_class in [BinaryAnalyses, MessageLengthAnalysis,
+                           MessageLineCountAnalysis]:
+        one_by_one = analysis_class()
+        batched = analysis_class()
+        _, one_by_one_time = timed(analyze, one_by_one, commits, None)
+        _, batched_time = timed(analyze, batched, commits, batch_size)
+
+        print(f"{one_by_one.name:20} one by one {one_by_one_time:6.2f} s,"
+              f" batches {batched_time:6.2f} s"
+              f" ({speedup(batched_time, one_by_one_time)})")
+        checks.check(
+            pickle.dumps(one_by_one.state) == pickle.dumps(batched.state),
+            f"Results of {one_by_one.name} differ!")
+
+    checks.finish("Results are the same.")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 8192)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+from benchmark_utils import CorpusGenerator, timed
+from fetch_commits import parse_commits
+
+
+def parse_commits_without_filter(file):
+    """Parse commits the old way (decoding every event), for comparison."""
+    for line in file:
+        event = json.loads(line)
+        if event['type'] == 'PushEvent':
+            for commit in event['payload']['commits']:
+                yield commit['message']
+
+
+def measure(parse, path):
+    """
+    Measure parsing speed.
+    :return: tuple of (events per second, number of commits)
+    """
+    with gzip.open(path, 'rb') as file:
+        lines = file.readlines()
+
+    commits, elapsed = timed(lambda: sum(1 for _ in parse(lines)))
+
+    return len(lines) / elapsed, commits
+
+
+def benchmark_parsing(path):
+    """
+    Compare parsing speed before and after pre-filtering push events.
+    Decompression is excluded, so only the parsing is measured.
+    :param path: path of a .json.gz archive
+    """
+    parsers = [
+        ("json.loads on every event", parse_commits_without_filter),
+        ("pre-filter + json", lambda lines: parse_commits(lines, json.loads)),
+    ]
+    try:
+        import orjson
+        parsers.append(("pre-filter + orjson",
+                        lambda lines: parse_commits(lines, orjson.loads)))
+    except ImportError:
+        print("orjson is not installed, skipping it.")
+
+    baseline = None
+    for name, parse in parsers:
+        speed, commits = measure(parse, path)
+        baseline = baseline or speed
+        print(f"{name:30} {speed:12,.0f} events/s"
+              f" ({speed / baseline:.2f}x, {commits} commits)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        benchmark_parsing(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            archive_path = os.path.join(directory, "fixture.json.gz")
+            CorpusGenerator().archive(archive_path, push_ratio=0.4)
+            benchmark_parsing(archive_path)
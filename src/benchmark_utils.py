@@ -0,0 +1,202 @@
+import gzip
+import json
+import random
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+
+# first words of messages with their weights
+FIRST_WORDS = [
+    ("Update", 30), ("Fix", 20), ("Add", 20), ("Merge", 15), ("fix", 8),
+    ("update", 8), ("add", 6), ("Initial", 4), ("Remove", 4), ("Added", 4),
+    ("Fixed", 4), ("Refactor", 3), ("Updated", 3), ("WIP", 2), ("Adding", 2),
+    ("Fixes", 2), ("Bump", 2), ("removed", 2), ("Changed", 2), ("updates", 2),
+    ("typo", 1), ("README", 1), ("v1.2.3", 1), ("tests", 1), ("Revert", 1),
+]
+# prefixes and tags before the first word with their weights
+PREFIXES = [
+    ("", 80), ("fix: ", 5), ("feat(core): ", 4), ("chore(deps): ", 2),
+    ("[core] ", 3), ("[WIP][ui] ", 1), ("docs:", 3), ("chore: [deps] ", 1),
+    ("Merge branch 'a:b' into c: ", 1),
+]
+WORDS = ["the", "readme", "tests", "bug", "for", "in", "to", "of", "and",
+         "version", "build", "config", "typo", "file", "files", "new",
+         "support", "issue", "docs", "login", "page", "api", "css", "#123",
+         "README.md", "1.0"]
+NON_ASCII_WORDS = ["über", "テスト", "café", "Éclair", "ÄÖÜ", "日本語", "\x80", "😀"]
+SHOUTED_MESSAGES = ["FIX", "WIP", "ÄÖÜ", "ABC1", "README"]
+EVENT_TYPES = ["WatchEvent", "CreateEvent", "IssuesEvent",
+               "PullRequestEvent", "IssueCommentEvent", "ForkEvent"]
+
+
+def weighted(choices):
+    """Split (value, weight) pairs into values and cumulative weights."""
+    values, weights = zip(*choices)
+    return list(values), list(accumulate(weights))
+
+
+class CorpusGenerator:
+    """
+    Generator of a synthetic corpus shared by the benchmarks.
+
+    Messages start with realistic first words, some of them after prefixes
+    like "fix:" or tags like "[core]", the other words follow Zipf's law
+    and half of the messages have a hash-like token, so there is a long tail
+    of words seen just once (like SHAs in real data). Some messages are
+    empty, written in capitals, have non-ASCII characters or end with
+    a full stop. Authors follow a long-tail distribution too (a few very
+    active ones and a lot of authors with a single commit).
+    """
+
+    def __init__(self, seed=0, vocabulary_size=20000, author_count=200000):
+        self.rng = random.Random(seed)
+        self.first_words, self.first_word_weights = weighted(FIRST_WORDS)
+        self.prefixes, self.prefix_weights = weighted(PREFIXES)
+        self.vocabulary = WORDS + [f"word{i}" for i in range(vocabulary_size)]
+        self.vocabulary_weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(self.vocabulary))))
+        self.author_weights = list(accumulate(
+            1 / (rank + 1) for rank in range(author_count)))
+
+    def message(self):
+        rng = self.rng
+        kind = rng.random()
+        if kind < 0.01:
+            return ""
+        if kind < 0.04:
+            return rng.choice(SHOUTED_MESSAGES)
+
+        words = rng.choices(self.vocabulary, cum_weights=self.vocabulary_weights,
+                            k=rng.randint(0, 6))
+        if rng.random() < 0.5:
+            words.append(f"{rng.getrandbits(40):010x}")
+        if rng.random() < 0.05:
+            words.insert(rng.randint(0, len(words)),
+                         rng.choice(NON_ASCII_WORDS))
+        first_word = \
+            rng.choices(self.prefixes, cum_weights=self.prefix_weights)[0] \
+            + rng.choices(self.first_words,
+                          cum_weights=self.first_word_weights)[0]
+        message = " ".join([first_word] + words)
+        if rng.random() < 0.2:
+            message += "."
+        return message
+
+    def lines(self):
+        return self.rng.choice([1, 1, 1, 2, 3, 5, 40])
+
+    def author(self):
+        return self.rng.choices(range(len(self.author_weights)),
+                                cum_weights=self.author_weights)[0]
+
+    def messages(self, count):
+        return [self.message() for _ in range(count)]
+
+    def commits(self, count):
+        """:return: list of (lines, message) tuples"""
+        return [(self.lines(), self.message()) for _ in range(count)]
+
+    def event(self, i, hour, push_ratio):
+        """
+        Generate an event in the Github Archive format.
+        Non-push events carry bigger payloads, like issues and pull requests do.
+        :return: tuple of (event, number of commits)
+        """
+        rng = self.rng
+        author = self.author()
+        event = {
+            'id': str(i),
+            'actor': {'id': author, 'login': f"user{author}"},
+            'repo': {'id': author,
+                     'name': f"user{author}/repo{rng.randrange(5)}"},
+            'public': True,
+            'created_at': f"{hour[:10]}T{int(hour[11:]):02}:00:00Z",
+        }
+        if rng.random() >= push_ratio:
+            event['type'] = rng.choice(EVENT_TYPES)
+            event['payload'] = {
+                'body': " ".join(rng.choices(WORDS, k=rng.randint(10, 300))),
+                'labels': [{'name': rng.choice(WORDS)} for _ in range(5)],
+            }
+            return event, 0
+
+        commits = []
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            message = self.message()
+            lines = self.lines()
+            if lines > 1:
+                message += "\n" + "\n".join(" ".join(rng.choices(WORDS, k=8))
+                                            for _ in range(lines - 1))
+            commits.append({
+                'sha': f"{rng.getrandbits(160):040x}",
+                'message': message,
+                'distinct': True,
+            })
+        event['type'] = 'PushEvent'
+        event['payload'] = {'commits': commits}
+        return event, len(commits)
+
+    def archive(self, path, hour="2017-01-01-0", events=200000,
+                push_ratio=0.5):
+        """
+        Write a synthetic hourly archive.
+        :param path: path of the .json.gz file to create
+        :param hour: hour of the events in yyyy-mm-dd-hh format
+        :param events: number of events
+        :param push_ratio: ratio of push events
+        :return: number of commits in the archive
+        """
+        commit_count = 0
+        with gzip.open(path, 'wt', compresslevel=1) as file:
+            for i in range(events):
+                event, commits = self.event(i, hour, push_ratio)
+                commit_count += commits
+                file.write(json.dumps(event) + "\n")
+        return commit_count
+
+
+def timed(function, *args):
+    """
+    Call a function and measure its wall time.
+    :return: tuple of (result, seconds)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def traced(function, *args):
+    """
+    Call a function and measure its wall time and memory allocated by it.
+    :return: tuple of (result, seconds, peak of allocated memory in bytes)
+    """
+    tracemalloc.start()
+    result, elapsed = timed(function, *args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def speedup(seconds, baseline_seconds):
+    return f"{baseline_seconds / seconds:.2f}x"
+
+
+class Checks:
+    """Checks of results of a benchmark, it fails if any of them fails."""
+
+    def __init__(self):
+        self.failed = False
+
+    def check(self, passed, message):
+        """Print the message if the check fails."""
+        if not passed:
+            print(message)
+            self.failed = True
+        return passed
+
+    def finish(self, message):
+        """Exit with an error if a check failed, print the message otherwise."""
+        if self.failed:
+            sys.exit(1)
+        print(message)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import re
+
+from analyses import VerbFormAnalysis
+from benchmark_utils import Checks, CorpusGenerator, speedup, timed
+from config import Directories
+from file_utils import load_txt_into_set
+
+
+class OldVerbFormAnalysis(VerbFormAnalysis):
+    """The previous implementation (a cascade of regexes), for comparison."""
+
+    def __init__(self):
+        super().__init__()
+        self.lists = {}
+        for form in self.forms:
+            self.lists[form] =\
+                load_txt_into_set(f"{Directories.processed_data}/{form}.txt")
+
+    def analyze_commit(self, author, repo, lines, message):
+        word = message.split(" ")[0].lower()
+        if not self.analyze_word(word):
+            word = re.sub("^.*:\\s*", "", message).split(" ")[0].lower()
+            if not self.analyze_word(word):
+                word = re.sub("^\\[.*\\]\\s*", "", message).split(" ")[0].lower()
+                if not self.analyze_word(word):
+                    self.counts['non_verb'] += 1
+
+    def analyze_word(self, word):
+        for form in self.forms:
+            if word in self.lists[form]:
+                self.counts[form] += 1
+                self.count_frequency(word, form)
+                return True
+        return False
+
+
+def analyze(analysis, messages):
+    for message in messages:
+        analysis.analyze_commit(None, None, 1, message)
+
+
+def benchmark_verb_form():
+    messages = CorpusGenerator().messages(200000)
+
+    old = OldVerbFormAnalysis()
+    new = VerbFormAnalysis()
+    _, old_time = timed(analyze, old, messages)
+    _, new_time = timed(analyze, new, messages)
+
+    print(f"regex cascade:     {len(messages) / old_time:12,.0f} commits/s")
+    print(f"single-pass:       {len(messages) / new_time:12,.0f} commits/s"
+          f" ({speedup(new_time, old_time)})")
+
+    checks = Checks()
+    checks.check(old.state == new.state, "Results differ!")
+    checks.finish("Results are the same.")
+
+
+if __name__ == '__main__':
+    benchmark_verb_form()
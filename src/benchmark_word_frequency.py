@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import sys
+
+from analyses import WordFrequencyAnalysis
+from benchmark_utils import Checks, CorpusGenerator, speedup, timed, \
+    traced
+
+
+def analyze(messages, max_words):
+    analysis = WordFrequencyAnalysis(max_words)
+    for message in messages:
+        analysis.analyze_commit(None, None, 1, message)
+    analysis.finalize()
+    return analysis
+
+
+def run(messages, max_words):
+    """
+    Run the word frequency analysis twice, to measure its time and then
+    its memory (tracing allocations slows it down a lot).
+    :return: tuple of (finalized analysis, seconds, peak of allocated memory)
+    """
+    analysis, elapsed = timed(analyze, messages, max_words)
+    _, _, peak = traced(analyze, messages, max_words)
+    return analysis, elapsed, peak
+
+
+def compare(max_words, top=10):
+    """
+    Compare the approximate top words with the exact ones.
+    Exits with an error if a count is out of its reported error bound,
+    the total number of words or the top words differ.
+    """
+    messages = CorpusGenerator().messages(300000)
+
+    exact, exact_time, exact_memory = run(messages, None)
+    approximate, approximate_time, approximate_memory = \
+        run(messages, max_words)
+
+    print(f"exact:       {exact_time:6.2f} s, {exact_memory / 2**20:7.1f} MiB,"
+          f" {len(exact.state)} words")
+    print(f"approximate: {approximate_time:6.2f} s,"
+          f" {approximate_memory / 2**20:7.1f} MiB,"
+          f" {len(approximate.state['words'])} words"
+          f" ({speedup(approximate_time, exact_time)})")
+
+    exact_counts = {x['word']: x['count'] for x in exact.state}
+    checks = Checks()
+    for x in approximate.state['words'][:top]:
+        true_count = exact_counts.get(x['word'], 0)
+        print(f"  {x['word']:12} {x['count']:8} ± {x['error']:<6}"
+              f" exact {true_count:8}")
+        checks.check(x['count'] - x['error'] <= true_count <= x['count'],
+                     f"  {x['word']} is out of its error bound")
+
+    exact_total = sum(x['count'] for x in exact.state)
+    checks.check(approximate.state['total'] == exact_total,
+                 f"Total number of words differs:"
+                 f" {approximate.state['total']} != {exact_total}")
+
+    exact_top = [x['word'] for x in exact.state[:top]]
+    approximate_top = [x['word'] for x in approximate.state['words'][:top]]
+    checks.check(exact_top == approximate_top,
+                 f"Top {top} words differ: {exact_top} != {approximate_top}")
+    checks.finish(f"Top {top} words match.")
+
+
+if __name__ == '__main__':
+    compare(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
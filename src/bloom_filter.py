@@ -0,0 +1,178 @@
+import math
+import os
+import shutil
+
+import numpy as np
+
+from file_utils import save_json, load_json
+
+
+class BloomFilter:
+    """
+    Bloom filter of hashes (e.g. commit SHAs) with a fixed capacity.
+
+    Items have to be uniformly distributed already, so the bit indexes
+    are derived from their first 16 bytes by double hashing
+    instead of hashing them again.
+    """
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        """
+        :param capacity: number of items the error rate is guaranteed for
+        :param error_rate: probability of a false positive at full capacity
+        :param bits: array of bits (uint8) to use, e.g. a memory-mapped file
+        :param count: number of items in the bits
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = self.bit_count(capacity, error_rate)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None \
+            else np.zeros(self.byte_count, np.uint8)
+        self.count = count
+
+    @staticmethod
+    def bit_count(capacity, error_rate):
+        return math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+
+    @property
+    def byte_count(self):
+        return (self.size + 7) // 8
+
+    def indexes(self, hashes):
+        """
+        :param hashes: tuple of (h1, h2) arrays of uint64, see split_hashes()
+        :return: array of bit indexes (items x hash_count)
+        """
+        h1, h2 = hashes
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) \
+            % np.uint64(self.size)
+
+    def contains(self, hashes):
+        """:return: array of booleans whether the items are (probably) in"""
+        indexes = self.indexes(hashes)
+        found = self.bits[indexes >> np.uint64(3)] \
+            & (np.uint8(1) << (indexes & np.uint64(7)).astype(np.uint8))
+        return np.all(found != 0, axis=1)
+
+    def add(self, hashes):
+        indexes = self.indexes(hashes).reshape(-1)
+        masks = np.uint8(1) << (indexes & np.uint64(7)).astype(np.uint8)
+        np.bitwise_or.at(self.bits, indexes >> np.uint64(3), masks)
+        self.count += len(hashes[0])
+
+
+def split_hashes(items):
+    """
+    Split items into hashes for BloomFilter.
+    :param items: list of byte strings of at least 16 bytes
+    :return: tuple of (h1, h2) arrays of uint64
+    """
+    data = np.frombuffer(b"".join(item[:16] for item in items), np.uint64)
+    data = data.reshape(-1, 2)
+    # an odd step makes the indexes of an item distinct
+    return data[:, 0].copy(), data[:, 1] | np.uint64(1)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter growing with the number of items.
+
+    When a filter is full, a new one with twice the capacity and half
+    the error rate is added, so the total error rate stays below twice
+    the initial one while memory grows with the number of items
+    (about 20 bits per item for the error rate of 1e-4).
+    With a directory, the filters are memory-mapped files, so only
+    the touched parts of them have to be in memory.
+    """
+
+    def __init__(self, initial_capacity, error_rate, directory=None):
+        """
+        :param initial_capacity: capacity of the first filter
+        :param error_rate: error rate of the first filter
+        :param directory: directory to persist the filters in,
+            existing filters are loaded from it
+        """
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.directory = directory
+        self.filters = []
+        # number of commits (of the commit store) added into the filters
+        self.length = 0
+
+        if directory and os.path.exists(self.meta_path):
+            self.load()
+
+    @property
+    def meta_path(self):
+        return f"{self.directory}/meta.json"
+
+    def bits_path(self, i):
+        return f"{self.directory}/{i}.bin"
+
+    def load(self):
+        meta = load_json(self.meta_path)
+        self.length = meta['length']
+        for i, entry in enumerate(meta['filters']):
+            bloom_filter = BloomFilter(entry['capacity'], entry['error_rate'],
+                                       count=entry['count'])
+            bloom_filter.bits = np.memmap(self.bits_path(i), np.uint8, 'r+')
+            self.filters.append(bloom_filter)
+
+    def add_filter(self):
+        i = len(self.filters)
+        bloom_filter = BloomFilter(self.initial_capacity * 2 ** i,
+                                   self.error_rate / 2 ** i, bits=np.empty(0))
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            bloom_filter.bits = np.memmap(self.bits_path(i), np.uint8, 'w+',
+                                          shape=bloom_filter.byte_count)
+        else:
+            bloom_filter.bits = np.zeros(bloom_filter.byte_count, np.uint8)
+        self.filters.append(bloom_filter)
+        return bloom_filter
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes[0]), bool)
+        for bloom_filter in self.filters:
+            found |= bloom_filter.contains(hashes)
+        return found
+
+    def add(self, hashes):
+        """Add items (filling the last filter and adding new ones if full)."""
+        start = 0
+        while start < len(hashes[0]):
+            bloom_filter = self.filters[-1] \
+                if self.filters and \
+                self.filters[-1].count < self.filters[-1].capacity \
+                else self.add_filter()
+            end = start + bloom_filter.capacity - bloom_filter.count
+            bloom_filter.add((hashes[0][start:end], hashes[1][start:end]))
+            start = end
+
+    def save(self, length):
+        """
+        Flush the filters to the disk (if persisted) and record
+        the number of commits they contain.
+        """
+        self.length = length
+        if not self.directory:
+            return
+
+        for bloom_filter in self.filters:
+            bloom_filter.bits.flush()
+        save_json({
+            'length': length,
+            'filters': [{'capacity': bloom_filter.capacity,
+                         'error_rate': bloom_filter.error_rate,
+                         'count': bloom_filter.count}
+                        for bloom_filter in self.filters],
+        }, self.meta_path + ".part")
+        os.replace(self.meta_path + ".part", self.meta_path)
+
+    def clear(self):
+        self.filters = []
+        self.length = 0
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,309 @@
+import os
+import mmap
+import uuid
+from array import array
+
+from config import Directories
+from file_utils import open_file_dir_safe, save_json, load_json
+
+
+class CommitStore:
+    """
+    Compact on-disk store of commits.
+
+    Authors and repositories are interned, i.e. stored as numeric IDs
+    pointing into tables of names. Each column is stored in its own file:
+        authors.bin   author IDs (uint32)
+        repos.bin     repository IDs (uint32)
+        lines.bin     numbers of lines of the messages (uint32)
+        times.bin     times of the pushes (Unix timestamps, uint32)
+        shas.bin      SHAs of the commits (20 bytes, zeros if unknown)
+        messages.bin  first lines of the messages in UTF-8,
+                      each prefixed by its length in bytes (uint16)
+        offsets.bin   offset in messages.bin of every OFFSET_STEP-th commit
+                      (uint64), so that reading can start anywhere
+        authors.txt, repos.txt
+                      names (one per line, the line number is the ID)
+    Commits are identified by their position in the store.
+    """
+
+    VERSION = 1
+    COLUMNS = {
+        'authors': 'I',
+        'repos': 'I',
+        'lines': 'I',
+        'times': 'I',
+    }
+    SHA_SIZE = 20
+    OFFSET_STEP = 1024
+    BLOCK_SIZE = 65536
+
+    def __init__(self, directory=Directories.commits):
+        self.directory = directory
+        self._names = {}
+        self._ids = {}
+
+        meta_path = self.path('meta.json')
+        if os.path.exists(meta_path):
+            version = load_json(meta_path)['version']
+            if version != self.VERSION:
+                raise ValueError(f"Commit store in {directory} has version"
+                                 f" {version}, expected {self.VERSION}."
+                                 f" Fetch the commits again.")
+
+    @property
+    def id(self):
+        """Random ID of the store, it changes when the store is created again."""
+        meta_path = self.path('meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        return load_json(meta_path).get('id')
+
+    def path(self, filename):
+        return f"{self.directory}/{filename}"
+
+    def files(self):
+        """Names of all the files the store consists of."""
+        return [f"{column}.bin" for column in self.COLUMNS] + \
+            ['shas.bin', 'messages.bin', 'offsets.bin', 'authors.txt',
+             'repos.txt']
+
+    def sizes(self):
+        """Sizes of the files (used to restore the store, see truncate())."""
+        return {filename: os.path.getsize(self.path(filename))
+                if os.path.exists(self.path(filename)) else 0
+                for filename in self.files()}
+
+    def truncate(self, sizes):
+        """
+        Throw away everything written after the files had the given sizes.
+        :param sizes: sizes returned by sizes()
+        """
+        for filename, size in sizes.items():
+            path = self.path(filename)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        self._names = {}
+        self._ids = {}
+
+    def __len__(self):
+        path = self.path('authors.bin')
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // array('I').itemsize
+
+    def names(self, table):
+        """
+        Get a list of names (indexed by ID).
+        :param table: 'authors' or 'repos'
+        """
+        if table not in self._names:
+            path = self.path(f"{table}.txt")
+            names = []
+            if os.path.exists(path):
+                file = open(path, encoding='utf-8')
+                with file:
+                    names = [line[:-1] for line in file]
+            self._names[table] = names
+        return self._names[table]
+
+    def name_count(self, table):
+        """
+        Get the number of names without loading them (see names()).
+        :param table: 'authors' or 'repos'
+        """
+        if table in self._names:
+            return len(self._names[table])
+        path = self.path(f"{table}.txt")
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        file = open(path, 'rb')
+        with file:
+            for block in iter(lambda: file.read(self.BLOCK_SIZE * 16), b""):
+                count += block.count(b"\n")
+        return count
+
+    @property
+    def author_names(self):
+        return self.names('authors')
+
+    @property
+    def repo_names(self):
+        return self.names('repos')
+
+    def intern(self, table, name, new_names):
+        """Get the ID of a name, assigning a new one if it's not known yet."""
+        if table not in self._ids:
+            self._ids[table] = {name: i
+                                for i, name in enumerate(self.names(table))}
+        ids = self._ids[table]
+
+        if name not in ids:
+            ids[name] = len(ids)
+            self.names(table).append(name)
+            new_names.append(name)
+        return ids[name]
+
+    def append(self, commits):
+        """
+        Append commits to the store and flush them to the disk.
+        :param commits: iterable of (author, repo, lines, message, time, sha)
+            tuples where sha is a hexadecimal string or None
+        """
+        if not os.path.exists(self.path('meta.json')):
+            save_json({'version': self.VERSION, 'id': uuid.uuid4().hex},
+                      self.path('meta.json'))
+
+        count = len(self)
+        columns = {column: array(typecode)
+                   for column, typecode in self.COLUMNS.items()}
+        new_names = {'authors': [], 'repos': []}
+        messages = bytearray()
+        shas = bytearray()
+        offsets = array('Q')
+        messages_size = os.path.getsize(self.path('messages.bin')) \
+            if os.path.exists(self.path('messages.bin')) else 0
+
+        for author, repo, lines, message, time, sha in commits:
+            encoded = message.encode()
+            if count % self.OFFSET_STEP == 0:
+                offsets.append(messages_size + len(messages))
+            count += 1
+
+            columns['authors'].append(
+                self.intern('authors', author, new_names['authors']))
+            columns['repos'].append(
+                self.intern('repos', repo, new_names['repos']))
+            columns['lines'].append(lines)
+            columns['times'].append(time)
+            shas += bytes.fromhex(sha) if sha else bytes(self.SHA_SIZE)
+
+            messages += len(encoded).to_bytes(2, 'little')
+            messages += encoded
+
+        for column, values in columns.items():
+            self.write(f"{column}.bin", values.tobytes())
+        self.write('shas.bin', shas)
+        self.write('messages.bin', messages)
+        self.write('offsets.bin', offsets.tobytes())
+        for table, names in new_names.items():
+            self.write(f"{table}.txt",
+                       "".join(name + "\n" for name in names).encode())
+
+    def write(self, filename, data):
+        file = open_file_dir_safe(self.path(filename), 'ab')
+        with file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def read_column(self, column, start, end):
+        """
+        Read values of a column.
+        :return: array of values of commits from start to end (excluded)
+        """
+        values = array(self.COLUMNS[column])
+        file = open(self.path(f"{column}.bin"), 'rb')
+        with file:
+            file.seek(start * values.itemsize)
+            values.fromfile(file, end - start)
+        return values
+
+    def read_shas(self, start, end):
+        """
+        Read SHAs of commits.
+        :return: list of SHAs (20 bytes each, zeros if unknown)
+        """
+        file = open(self.path('shas.bin'), 'rb')
+        with file:
+            file.seek(start * self.SHA_SIZE)
+            data = file.read((end - start) * self.SHA_SIZE)
+        return [data[i:i + self.SHA_SIZE]
+                for i in range(0, len(data), self.SHA_SIZE)]
+
+    def read(self, start=0, end=None):
+        """
+        Read commits.
+        :param start: position of the first commit
+        :param end: position after the last commit (default is the end)
+        :return: generator of (author ID, repo ID, lines, message, time)
+            tuples
+        """
+        for chunk in self.read_chunks(start, end):
+            yield from zip(*chunk)
+
+    def read_chunks(self, start=0, end=None, chunk_size=BLOCK_SIZE):
+        """
+        Read commits in chunks.
+        :param start: position of the first commit
+        :param end: position after the last commit (default is the end)
+        :param chunk_size: maximal number of commits in a chunk
+        :return: generator of (author IDs, repo IDs, lines, messages, times)
+            tuples, the messages are a list and the other columns arrays
+        """
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return
+
+        file = open(self.path('messages.bin'), 'rb')
+        with file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) \
+                as messages:
+            position = self.message_offset(start, messages)
+
+            for chunk_start in range(start, end, chunk_size):
+                chunk_end = min(chunk_start + chunk_size, end)
+                columns = {column: self.read_column(column, chunk_start,
+                                                    chunk_end)
+                           for column in self.COLUMNS}
+
+                chunk_messages = []
+                for _ in range(chunk_end - chunk_start):
+                    length = messages[position] | messages[position + 1] << 8
+                    position += 2
+                    chunk_messages.append(
+                        messages[position:position + length].decode())
+                    position += length
+                yield columns['authors'], columns['repos'], \
+                    columns['lines'], chunk_messages, columns['times']
+
+    def read_commits(self, positions):
+        """
+        Read commits at given positions (e.g. found by MessageIndex).
+        :return: list of (author, repo, lines, message, time) tuples
+            with names of the authors and repos
+        """
+        commits = []
+        file = open(self.path('messages.bin'), 'rb')
+        with file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) \
+                as messages:
+            for position in positions:
+                offset = self.message_offset(position, messages)
+                length = messages[offset] | messages[offset + 1] << 8
+                values = {column: self.read_column(column, position,
+                                                   position + 1)[0]
+                          for column in self.COLUMNS}
+                commits.append((
+                    self.author_names[values['authors']],
+                    self.repo_names[values['repos']],
+                    values['lines'],
+                    messages[offset + 2:offset + 2 + length].decode(),
+                    values['times'],
+                ))
+        return commits
+
+    def message_offset(self, position, messages):
+        """Find the offset of a commit's message in messages.bin."""
+        step = position // self.OFFSET_STEP
+        offset = self.read_offset(step)
+        for _ in range(position - step * self.OFFSET_STEP):
+            offset += 2 + (messages[offset] | messages[offset + 1] << 8)
+        return offset
+
+    def read_offset(self, step):
+        offsets = array('Q')
+        file = open(self.path('offsets.bin'), 'rb')
+        with file:
+            file.seek(step * offsets.itemsize)
+            offsets.fromfile(file, 1)
+        return offsets[0]
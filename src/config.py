@@ -4,7 +4,71 @@ class Directories:
     data = root + "/" + "data"
     processed_data = data + "/" + "processed"
     raw_data = data + "/" + "raw"
+    archives = data + "/" + "archives"
+    commits = processed_data + "/" + "commits"
 
     outputs = root + "/" + "outputs"
     charts = outputs + "/" + "charts"
     json_outputs = outputs + "/" + "json"
+    rollups = outputs + "/" + "rollups"
+    message_index = processed_data + "/" + "message_index"
+
+
+class GithubArchive:
+    # can be pointed to a local mirror (or a test server) serving the same files
+    url = "http://data.githubarchive.org"
+
+
+class Fetching:
+    # number of hourly archives downloaded at the same time
+    workers = 8
+    # commits of an archive are passed from its downloading thread
+    # in batches of this size
+    batch_size = 8192
+    # commits of hours that aren't being saved yet are kept in memory
+    # up to this size (in bytes, estimated), their downloading then waits
+    buffer_size = 512 * 1024 * 1024
+    # decompress and parse archives while they are being downloaded
+    # instead of buffering the whole compressed archive in memory
+    streaming = True
+    # keep downloaded archives in data/archives so that commits can be
+    # parsed again (see reparse_commits.py) without downloading them
+    cache_archives = True
+    # the least recently used archives are deleted above this size (in bytes)
+    cache_size = 20 * 1024 ** 3
+    # drop commits with SHAs that have already been saved (the same commit
+    # is often pushed more times), see deduplication.py
+    deduplicate = True
+    # initial capacity and error rate of the Bloom filter of seen SHAs
+    # (the error rate is the probability of dropping a unique commit)
+    dedup_capacity = 1000000
+    dedup_error_rate = 1e-4
+    # commits are indexed by days (or hours), so that only commits of a date
+    # range can be analyzed, see shard_index.py
+    shard_granularity = 'day'
+
+
+class Analyzing:
+    # number of processes running the analyses, 1 means no parallelization
+    processes = 1
+    # number of commits read and given to the analyses at once
+    chunk_size = 8192
+    # number of fetched hours waiting for the analysis in analyze_stream.py
+    stream_queue_size = 4
+    # granularity of time series of results ('hour', 'day', 'month' or 'year'),
+    # None means no time series, just results for all the commits
+    buckets = None
+    # number of time buckets whose analyses are kept in memory,
+    # the other ones are temporarily pickled to the disk
+    max_buckets = 32
+    # number of seconds between progress lines of analyze.py --profile
+    profile_interval = 10
+
+
+class Plotting:
+    # number of processes rendering charts, 1 means no parallelization
+    processes = 1
+    # formats of the charts (any format supported by matplotlib)
+    formats = ['png', 'svg', 'pdf']
+    # resolution of raster formats
+    dpi = 300
@@ -16,20 +16,25 @@ class ConjugationGenerator:
         self.vowel = "[aeiouy]"
         self.consonant = "[b-df-hj-np-tv-z]"
 
+        self.consonant_y = re.compile(f"{self.consonant}y$")
+        self.sibilant = re.compile("(s|z|ch|sh|x)$")
+        self.consonant_vowel_consonant = \
+            re.compile(f"{self.consonant}{self.vowel}{self.consonant}$")
+
     def imperative(self, infinitive):
         return infinitive
 
     def third_person(self, infinitive):
-        if re.search(f"{self.consonant}y$", infinitive):
+        if self.consonant_y.search(infinitive):
             return infinitive[:-1] + "ies"
-        if re.search("(s|z|ch|sh|x)$", infinitive) or infinitive.endswith("o"):
+        if self.sibilant.search(infinitive) or infinitive.endswith("o"):
             return infinitive + "es"
         return infinitive + "s"
 
     def gerund(self, infinitive):
         if infinitive.endswith("e"):
             return infinitive[:-1] + "ing"
-        if re.search(f"{self.consonant}{self.vowel}{self.consonant}$", infinitive) \
+        if self.consonant_vowel_consonant.search(infinitive) \
                 and not infinitive.endswith("fix"):
             return infinitive + infinitive[-1] + "ing"
         return infinitive + "ing"
@@ -39,9 +44,9 @@ class ConjugationGenerator:
             return self.irregular[infinitive]
         if infinitive.endswith("e"):
             return infinitive + "d"
-        if re.search(f"{self.consonant}{self.vowel}{self.consonant}$", infinitive) \
+        if self.consonant_vowel_consonant.search(infinitive) \
                 and not infinitive.endswith("fix"):
             return infinitive + infinitive[-1] + "ed"
-        if re.search(f"{self.consonant}y$", infinitive):
+        if self.consonant_y.search(infinitive):
             return infinitive[:-1] + "ied"
         return infinitive + "ed"
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import sys
+
+from config import Directories
+from commit_store import CommitStore
+from fetch_manifest import FetchManifest
+
+
+def read_lines(path):
+    """Read lines of a text file one by one."""
+    file = open(path, 'rb')
+    with file:
+        for line in file:
+            yield line.decode()
+
+
+class LineParser:
+    """Parser of lines in author::repo::lines::message format."""
+
+    def __init__(self):
+        # number of lines that couldn't be parsed
+        self.skipped = 0
+
+    def parse(self, lines, time):
+        """
+        :param time: time of the commits (the old format has no times)
+        :return: generator of (author, repo, lines, message, time, sha)
+            tuples (the old format has no SHAs)
+        """
+        for line in lines:
+            try:
+                [author, repo, lines, message] = line.split("::", 3)
+                yield author, repo, int(lines), message.strip(), time, None
+            except ValueError:
+                self.skipped += 1
+
+
+def convert_commits(path=f"{Directories.processed_data}/commits.txt"):
+    """
+    Convert a commits file in the old text format into the commit store.
+    Commits are streamed into the store, so the file isn't loaded
+    into memory. Hours of the commits aren't known, so they are recorded
+    as a single unknown hour (see FetchManifest) with time 0.
+    :param path: path of the commits file
+    """
+    store = CommitStore()
+    if len(store) > 0:
+        print(f"Commit store {store.directory} is not empty, remove it first.")
+        return
+
+    manifest = FetchManifest(store)
+    parser = LineParser()
+    print(f"Converting commits from {path}")
+    manifest.save(FetchManifest.UNKNOWN_HOUR,
+                  parser.parse(read_lines(path), 0))
+    if parser.skipped:
+        print(f"Skipped {parser.skipped} lines that couldn't be parsed.")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        convert_commits(sys.argv[1])
+    else:
+        convert_commits()
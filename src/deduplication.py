@@ -0,0 +1,89 @@
+from config import Fetching
+from bloom_filter import ScalableBloomFilter, split_hashes
+
+
+class CommitDeduplicator:
+    """
+    Drops commits that have already been seen (by their SHA).
+
+    The same commit is often pushed more times (to other branches,
+    forks, ...). SHAs of seen commits are kept in a scalable Bloom filter,
+    so memory grows slowly with the number of commits, but a unique commit
+    is dropped with the probability of about twice Fetching.dedup_error_rate.
+    Filters of a commit store are saved in its directory (dedup/),
+    so duplicates are dropped also across resumed runs, and they are
+    rebuilt from the SHAs in the store if they are behind it.
+    """
+
+    # number of SHAs read at once when the filters are rebuilt
+    READ_STEP = 1024 * 1024
+
+    def __init__(self, store=None, length=0):
+        """
+        :param store: CommitStore of the saved commits,
+            or None to keep the filters just in memory
+        :param length: number of finished commits in the store
+        """
+        self.filter = ScalableBloomFilter(
+            Fetching.dedup_capacity, Fetching.dedup_error_rate,
+            store.path('dedup') if store is not None else None)
+
+        if store is not None:
+            if self.filter.length > length:
+                self.filter.clear()
+            for start in range(self.filter.length, length, self.READ_STEP):
+                end = min(start + self.READ_STEP, length)
+                self.filter.add(split_hashes(
+                    [sha for sha in store.read_shas(start, end) if any(sha)]))
+                self.filter.save(end)
+
+    def deduplicate(self, commits, seen=None):
+        """
+        Drop commits seen before and repeated commits.
+        Commits without a SHA are kept.
+        :param commits: list of commits returned by fetch_commits()
+        :param seen: set of SHAs of commits that haven't been added yet
+            (e.g. earlier batches of the same hour), SHAs of the kept
+            commits are added to it
+        :return: tuple of (kept commits, number of dropped commits)
+        """
+        kept = []
+        shas = []
+        seen = set() if seen is None else seen
+        for commit in commits:
+            sha = commit[5]
+            if sha is None:
+                kept.append(commit)
+            elif sha not in seen:
+                seen.add(sha)
+                kept.append(commit)
+                shas.append(bytes.fromhex(sha))
+
+        if shas:
+            found = self.filter.contains(split_hashes(shas)).tolist()
+            seen.difference_update(sha.hex() for sha, is_found
+                                   in zip(shas, found) if is_found)
+            found = iter(found)
+            kept = [commit for commit in kept
+                    if commit[5] is None or not next(found)]
+        return kept, len(commits) - len(kept)
+
+    def add(self, commits, length):
+        """
+        Remember SHAs of saved commits.
+        :param commits: commits returned by deduplicate()
+        :param length: number of finished commits in the store with them
+        """
+        self.add_shas([commit[5] for commit in commits
+                       if commit[5] is not None], length)
+
+    def add_shas(self, shas, length):
+        """
+        Remember SHAs of saved commits.
+        :param shas: iterable of hexadecimal SHAs
+        :param length: number of finished commits in the store with them
+        """
+        shas = [bytes.fromhex(sha) for sha in shas]
+        if shas:
+            self.filter.add(split_hashes(shas))
+        self.filter.save(length)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+
+from config import Directories
+from file_utils import open_file_dir_safe, save_json
+from plotters import all_plotters
+
+
+def export_series(plotters, output_format='csv'):
+    """
+    Export the values of charts without rendering them.
+    Series are saved into outputs/series as <chart name>.csv or .json.
+    :param plotters: list of plotters
+    :param output_format: 'csv' or 'json'
+    """
+    for plotter in plotters:
+        values = plotter.compute_values()
+        path = f"{Directories.outputs}/series/{plotter.name}.{output_format}"
+
+        if output_format == 'json':
+            save_json([{'x': x, 'y': y} for x, y in values], path)
+        else:
+            file = open_file_dir_safe(path, 'w')
+            with file:
+                writer = csv.writer(file)
+                writer.writerow([plotter.x_label, plotter.y_label])
+                writer.writerows(values)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export values of the charts as CSV or JSON.")
+    parser.add_argument('charts', nargs='*',
+                        help="names of the charts to export (default is all)")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    args = parser.parse_args()
+
+    plotters = [plotter for plotter in all_plotters()
+                if not args.charts or plotter.name in args.charts]
+    export_series(plotters, args.format)
@@ -1,45 +1,149 @@
 #!/usr/bin/env python3
 import sys
-import os
 import json
 import gzip
 import urllib.request
 import io
+import zlib
+from json.decoder import JSONDecodeError
+from contextlib import contextmanager
 
-from config import Directories
-from file_utils import open_file_dir_safe
+from config import GithubArchive, Fetching
+from fetch_manifest import FetchManifest
+from archive_cache import ArchiveCache
+from time_buckets import parse_event_time
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
-def fetch_and_parse_commits(date):
+# raw lines without it can't be push events, so they aren't decoded at all
+PUSH_EVENT_MARKER = b'"PushEvent"'
+
+# errors of downloading or reading an archive that fail just its hour
+# (HTTP and network errors are OSErrors, truncated gzip streams EOFErrors)
+ARCHIVE_ERRORS = (OSError, EOFError, zlib.error, JSONDecodeError)
+
+
+class FetchError(Exception):
+    """Commits of an hour can't be fetched, the hour should be retried later."""
+
+
+def create_archive_cache():
+    """
+    Create the cache of downloaded archives (it creates its directory).
+    :return: ArchiveCache or None if archives aren't cached
+        (see Fetching.cache_archives)
+    """
+    return ArchiveCache() if Fetching.cache_archives else None
+
+
+@contextmanager
+def open_archive(date, archive_cache=None):
+    """
+    Open an hourly archive for reading.
+    Cached archives are read from the disk, other ones are downloaded.
+    In streaming mode, the response is decompressed as it is being downloaded,
+    otherwise the whole archive is downloaded first.
+    :param date: hour in yyyy-mm-dd-hh format
+    :param archive_cache: ArchiveCache to read the archive from and store
+        it into, None means no caching
+    :return: context manager of a decompressed file-like object
+    """
+    cached_file = archive_cache.open(date) if archive_cache else None
+    if cached_file:
+        with gzip.GzipFile(fileobj=cached_file) as file, cached_file:
+            yield file
+        return
+
+    url = f"{GithubArchive.url}/{date}.json.gz"
+
+    with urllib.request.urlopen(url) as response:
+        if Fetching.streaming:
+            compressed_file = response
+        else:
+            compressed_file = io.BytesIO(response.read())
+
+        if archive_cache:
+            with archive_cache.store(date, compressed_file) as cached_file, \
+                    gzip.GzipFile(fileobj=cached_file) as file:
+                yield file
+        else:
+            with gzip.GzipFile(fileobj=compressed_file) as file:
+                yield file
+
+
+def parse_commits(file, loads=json_loads):
+    """
+    Parse commits from a decompressed archive.
+    Only lines that look like push events are decoded.
+    :param file: binary file-like object with one JSON event per line
+    :param loads: function decoding JSON
+    :return: generator of (author, repo, lines, message, time, sha) tuples
+        where message is the first line of the commit message,
+        time is the Unix timestamp of the push and sha the commit SHA
+    """
+    for line in file:
+        if PUSH_EVENT_MARKER not in line:
+            continue
+
+        event = loads(line)
+        if event['type'] == 'PushEvent':
+            author = event['actor']['login']
+            repo = event['repo']['name']
+            time = parse_event_time(event['created_at'])
+            commits = event['payload']['commits']
+            for commit in commits:
+                message_lines = commit['message'].split("\n")
+                first_line = message_lines[0].replace('\r', '')
+                if len(first_line) > 300:
+                    continue
+
+                yield author, repo, len(message_lines), first_line.strip(), \
+                    time, commit.get('sha')
+
+
+def fetch_commits(date, archive_cache=None):
     """
     Fetch and parse commits for a given hour.
+    Commits are parsed while the archive is being read, so the commits
+    of the hour are never all in memory.
     :param date: hour in yyyy-mm-dd-hh format
+    :param archive_cache: ArchiveCache (see open_archive())
+    :return: generator of (author, repo, lines, message, time, sha) tuples
+    :raise FetchError: if the archive can't be downloaded or read
+        (commits of the hour generated before are incomplete)
     """
-    url = f"http://data.githubarchive.org/{date}.json.gz"
-
-    response = urllib.request.urlopen(url)
-    compressed_file = io.BytesIO(response.read())
-    file = gzip.GzipFile(fileobj=compressed_file)
-
-    output_filename = f"{Directories.processed_data}/commits.txt"
-    output_mode = "a" if os.path.exists(output_filename) else "w"
-    output_file = open_file_dir_safe(output_filename, output_mode)
-
-    with file as f:
-        for line in f:
-            event = json.loads(line)
-            if event['type'] == 'PushEvent':
-                author = event['actor']['login']
-                repo = event['repo']['name']
-                commits = event['payload']['commits']
-                for commit in commits:
-                    message_lines = commit['message'].split("\n")
-                    first_line = message_lines[0].replace('\r', '')
-                    if len(first_line) > 300:
-                        continue
-
-                    output_file.write(f"{author}::{repo}::"
-                                      f"{len(message_lines)}::{first_line}\n")
+    try:
+        with open_archive(date, archive_cache) as file:
+            yield from parse_commits(file)
+    except ARCHIVE_ERRORS as error:
+        raise FetchError(f"Fetching commits for {date} failed: {error}") \
+            from error
+
+
+def fetch_and_parse_commits(date):
+    """
+    Fetch and parse commits for a given hour and save them.
+    Hours that have already been saved are skipped.
+    :param date: hour in yyyy-mm-dd-hh format
+    """
+    manifest = FetchManifest()
+    if manifest.is_done(date):
+        print(f"Commits for {date} have already been fetched, skipping.")
+        return
+
+    print(f"Downloading commits for {date}")
+    try:
+        duplicates = manifest.save(date,
+                                   fetch_commits(date, create_archive_cache()))
+    except FetchError as error:
+        manifest.discard()
+        print(f"{error}, skipping.")
+        sys.exit(1)
+    if duplicates:
+        print(f"Dropped {duplicates} duplicate commits.")
 
 
 if __name__ == '__main__':
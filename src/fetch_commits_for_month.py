@@ -1,30 +1,21 @@
 #!/usr/bin/env python3
 import sys
 
-from urllib.error import HTTPError
-from json.decoder import JSONDecodeError
-from time import gmtime, strftime
-from fetch_commits import fetch_and_parse_commits
+from config import Fetching
+from fetch_scheduler import hours_of_month, fetch_and_parse_commits_for_hours
 
 
-def fetch_and_parse_commits_for_month(year, month):
+def fetch_and_parse_commits_for_month(year, month, workers=Fetching.workers):
     """
     Fetch and parse commits for a given month.
     :param year: year in yyyy format
     :param month: month in mm format
+    :param workers: number of archives downloaded at the same time
     """
-    for day in range(1, 32):
-        for hour in range(0, 24):
-            time = strftime("%H:%M:%S", gmtime())
-            print(f"[{time}] Downloading commits for {year}-{month}-{day}-{hour}")
-            try:
-                fetch_and_parse_commits(f"{year}-{month:02}-{day:02}-{hour}")
-            except HTTPError:
-                print("HTTP Error, skipping.")
-            except JSONDecodeError:
-                print("Error in decoding JSON, skipping.")
-            sys.stdout.flush()
+    fetch_and_parse_commits_for_hours(hours_of_month(year, month), workers)
 
 
 if __name__ == '__main__':
-    fetch_and_parse_commits_for_month(int(sys.argv[1]), int(sys.argv[2]))
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else Fetching.workers
+    fetch_and_parse_commits_for_month(int(sys.argv[1]), int(sys.argv[2]),
+                                      workers)
@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 import sys
 
-from fetch_commits_for_month import fetch_and_parse_commits_for_month
+from config import Fetching
+from fetch_scheduler import hours_of_month, fetch_and_parse_commits_for_hours
 
 
-def fetch_and_parse_commits_for_year(year):
+def fetch_and_parse_commits_for_year(year, workers=Fetching.workers):
     """
     Fetch and parse commits for a given year.
     :param year: year in yyyy format
+    :param workers: number of archives downloaded at the same time
     """
-    for month in range(1, 13):
-            fetch_and_parse_commits_for_month(year, month)
+    hours = (hour
+             for month in range(1, 13)
+             for hour in hours_of_month(year, month))
+    fetch_and_parse_commits_for_hours(hours, workers)
 
 
 if __name__ == '__main__':
-    fetch_and_parse_commits_for_year(sys.argv[1])
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else Fetching.workers
+    fetch_and_parse_commits_for_year(int(sys.argv[1]), workers)
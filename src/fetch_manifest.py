@@ -0,0 +1,159 @@
+import os
+import json
+from itertools import islice
+
+from config import Fetching
+from commit_store import CommitStore
+from deduplication import CommitDeduplicator
+
+
+class FetchManifest:
+    """
+    Manifest of hours whose commits have been completely saved.
+
+    Every saved hour is recorded together with the range of its commits
+    in the commit store and the sizes of the store files after saving it,
+    so an interrupted run can be resumed: finished hours are skipped and
+    commits of an unfinished hour (written after the last recorded one)
+    are thrown away.
+    """
+
+    # hour of commits that were not saved hour by hour (e.g. converted ones)
+    UNKNOWN_HOUR = "-"
+
+    def __init__(self, store=None, recover=True,
+                 deduplicate=Fetching.deduplicate):
+        """
+        :param store: CommitStore the commits are saved to
+        :param recover: whether to throw away unfinished commits,
+            don't do it when just reading the store (a fetch may be running)
+        :param deduplicate: drop commits that have already been saved
+            (see CommitDeduplicator)
+        """
+        self.store = store if store is not None else CommitStore()
+        self.deduplicate = deduplicate
+        self.deduplicator = None
+        self.duplicates = 0
+        self.path = self.store.path('manifest.jsonl')
+        self.hours = {}
+        self.sizes = None
+        # number of commits in the store that belong to finished hours
+        self.length = 0
+        self.valid_length = 0
+
+        self.load()
+        if recover:
+            self.recover()
+        elif self.sizes is None:
+            self.length = len(self.store)
+
+    def load(self):
+        """Load finished hours, ignoring a partially written last entry."""
+        if not os.path.exists(self.path):
+            return
+
+        file = open(self.path, 'rb')
+        with file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                self.hours[entry['hour']] = (entry['start'], entry['end'])
+                self.sizes = entry['sizes']
+                self.length = max(self.length, entry['end'])
+                self.valid_length += len(line)
+
+    def entries(self, offset=0):
+        """
+        Read finished entries of the manifest.
+        :param offset: position in the manifest file to start from
+        :return: generator of entries (dictionaries)
+        """
+        if not os.path.exists(self.path):
+            return
+
+        file = open(self.path, 'rb')
+        with file:
+            file.seek(offset)
+            for line in file:
+                offset += len(line)
+                if offset > self.valid_length:
+                    break
+                yield json.loads(line)
+
+    def recover(self):
+        """Bring the commit store and the manifest into a consistent state."""
+        if os.path.exists(self.path):
+            os.truncate(self.path, self.valid_length)
+
+        if self.sizes is not None:
+            self.store.truncate(self.sizes)
+        elif len(self.store) > 0:
+            print("Commit store has no manifest, keeping all its commits.")
+            self.record(self.UNKNOWN_HOUR, 0, len(self.store))
+
+    def discard(self):
+        """
+        Throw away commits appended after the last recorded hour
+        (e.g. when fetching of an hour fails while it is being saved).
+        """
+        self.store.truncate(self.sizes if self.sizes is not None
+                            else dict.fromkeys(self.store.files(), 0))
+
+    def is_done(self, hour):
+        """
+        Check whether commits for the hour have already been saved.
+        :param hour: hour in yyyy-mm-dd-hh format
+        """
+        return hour in self.hours
+
+    def record(self, hour, start, end, duplicates=0):
+        self.sizes = self.store.sizes()
+        entry = {'hour': hour, 'start': start, 'end': end, 'sizes': self.sizes,
+                 'duplicates': duplicates}
+
+        os.makedirs(self.store.directory, exist_ok=True)
+        file = open(self.path, 'a')
+        with file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.hours[hour] = (start, end)
+        self.length = max(self.length, end)
+
+    def save(self, hour, commits, batch_size=CommitStore.BLOCK_SIZE):
+        """
+        Append commits of an hour to the commit store and record the hour.
+        Commits are appended in batches, so they can be streamed
+        (the hour is recorded after the last batch).
+        :param hour: hour in yyyy-mm-dd-hh format
+        :param commits: iterable of commits, see fetch_commits()
+        :param batch_size: number of commits appended at once
+        :return: number of dropped duplicate commits
+        """
+        if self.deduplicate and self.deduplicator is None:
+            self.deduplicator = CommitDeduplicator(self.store, self.length)
+
+        start = len(self.store)
+        duplicates = 0
+        # SHAs of the saved commits of the hour
+        shas = set()
+        commits = iter(commits)
+        while True:
+            batch = list(islice(commits, batch_size))
+            is_last = len(batch) < batch_size
+            if self.deduplicate:
+                batch, dropped = self.deduplicator.deduplicate(batch, shas)
+                duplicates += dropped
+            self.store.append(batch)
+            if is_last:
+                break
+        self.record(hour, start, len(self.store), duplicates)
+
+        # only commits of recorded hours are added, an unfinished hour
+        # is fetched again after a crash and its commits are not duplicates
+        if self.deduplicate:
+            self.deduplicator.add_shas(shas, self.length)
+        self.duplicates += duplicates
+        return duplicates
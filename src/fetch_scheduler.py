@@ -0,0 +1,246 @@
+import sys
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from queue import Queue
+from time import gmtime, strftime
+
+from config import Fetching
+from fetch_commits import fetch_commits, create_archive_cache, FetchError
+from fetch_manifest import FetchManifest
+from shard_index import ShardIndex
+
+
+def hours_of_month(year, month):
+    """
+    List all hours of a month (days that don't exist are included too,
+    Github Archive just responds with 404 for them).
+    :param year: year in yyyy format
+    :param month: month in mm format
+    :return: list of hours in yyyy-mm-dd-hh format
+    """
+    return [f"{year}-{month:02}-{day:02}-{hour}"
+            for day in range(1, 32)
+            for hour in range(0, 24)]
+
+
+class FetchBuffer:
+    """
+    Memory budget of commits that have been fetched but not read yet,
+    shared by all hours that are being fetched. Hours that aren't being read
+    keep fetching until the budget is used up, the hour being read can always
+    have 2 batches waiting (the budget is freed only by reading it).
+    """
+
+    # estimated size of a commit tuple besides its strings (in bytes)
+    COMMIT_OVERHEAD = 400
+
+    def __init__(self, size=Fetching.buffer_size):
+        self.size = size
+        self.used = 0
+        self.condition = threading.Condition()
+
+    @classmethod
+    def batch_size(cls, batch):
+        """:return: estimated memory of a batch of commits in bytes"""
+        return sum(len(author) + len(repo) + len(message)
+                   for author, repo, _, message, _, _ in batch) \
+            + cls.COMMIT_OVERHEAD * len(batch)
+
+    def acquire(self, size, fetch):
+        """
+        Wait until a batch fits in the budget (a single batch always fits).
+        :param fetch: HourFetch of the batch
+        :return: whether the batch can be kept (the reader hasn't left)
+        """
+        with self.condition:
+            while (self.used and self.used + size > self.size
+                   and not (fetch.reading and fetch.batches.qsize() < 2)
+                   and not fetch.cancelled.is_set()):
+                self.condition.wait(0.1)
+            if fetch.cancelled.is_set():
+                return False
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    def notify(self):
+        """Wake up the fetching waiting for the budget."""
+        with self.condition:
+            self.condition.notify_all()
+
+
+class HourFetch:
+    """
+    Commits of an hour passed from the thread fetching them to the reader
+    in batches, the fetching waits when the batches waiting to be read
+    use up the FetchBuffer.
+    """
+
+    FINISHED = object()
+
+    def __init__(self, date, buffer, archive_cache=None,
+                 batch_size=Fetching.batch_size):
+        self.date = date
+        self.buffer = buffer
+        self.archive_cache = archive_cache
+        self.batch_size = batch_size
+        # (item, size) pairs, an item is a batch, an error or FINISHED
+        self.batches = Queue()
+        # batches are put and dropped under the lock, so none of them
+        # is left behind in the buffer when the reader leaves
+        self.lock = threading.Lock()
+        # set when the reader starts reading, the fetching isn't throttled
+        self.reading = False
+        # set when the reader stops reading, the fetching then stops too
+        self.cancelled = threading.Event()
+
+    def put(self, item, size=0):
+        """:return: whether the item has been put (the reader hasn't left)"""
+        if size and not self.buffer.acquire(size, self):
+            return False
+        with self.lock:
+            if self.cancelled.is_set():
+                self.buffer.release(size)
+                return False
+            self.batches.put((item, size))
+            return True
+
+    def cancel(self):
+        """Stop the fetching and drop the batches that haven't been read."""
+        with self.lock:
+            self.cancelled.set()
+            while not self.batches.empty():
+                _, size = self.batches.get()
+                self.buffer.release(size)
+        self.buffer.notify()
+
+    def fetch(self):
+        """Fetch the commits (in a thread)."""
+        if self.cancelled.is_set():
+            return
+        time = strftime("%H:%M:%S", gmtime())
+        print(f"[{time}] Downloading commits for {self.date}")
+        sys.stdout.flush()
+
+        commits = fetch_commits(self.date, self.archive_cache)
+        try:
+            while True:
+                batch = list(islice(commits, self.batch_size))
+                if not batch:
+                    break
+                if not self.put(batch, FetchBuffer.batch_size(batch)):
+                    return
+        except BaseException as error:
+            self.put(error)
+            return
+        finally:
+            commits.close()
+        self.put(self.FINISHED)
+
+    def commits(self):
+        """
+        Read the commits.
+        :return: generator of commits, see fetch_commits()
+        :raise FetchError: if the hour can't be fetched
+        """
+        self.reading = True
+        self.buffer.notify()
+        try:
+            while True:
+                batch, size = self.batches.get()
+                self.buffer.release(size)
+                if batch is self.FINISHED:
+                    return
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield from batch
+        finally:
+            self.cancel()
+
+
+def fetch_commits_for_hours(hours, workers=Fetching.workers,
+                            archive_cache=None):
+    """
+    Fetch and parse commits for given hours.
+
+    Archives are downloaded and parsed by a pool of threads
+    but commits are always yielded in the order of the given hours.
+    Commits are streamed (see HourFetch), at most 2 * workers hours
+    are being fetched at the same time and commits of the hours that
+    aren't being read are buffered up to Fetching.buffer_size.
+    Iterating over the commits of an hour that fails to download or decode
+    raises FetchError, the hour must then be thrown away (its commits
+    read before are incomplete), see fetch_and_parse_commits_for_hours().
+    :param hours: iterable of hours in yyyy-mm-dd-hh format
+    :param workers: number of archives downloaded at the same time
+    :param archive_cache: ArchiveCache (see open_archive())
+    :return: generator of (hour, iterator of commits), see fetch_commits()
+    """
+    hours = iter(hours)
+    pending = deque()
+    buffer = FetchBuffer()
+
+    def submit_next():
+        for date in hours:
+            fetch = HourFetch(date, buffer, archive_cache)
+            executor.submit(fetch.fetch)
+            pending.append(fetch)
+            return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for _ in range(2 * workers):
+                submit_next()
+
+            while pending:
+                fetch = pending.popleft()
+                submit_next()
+                commits = fetch.commits()
+                try:
+                    yield fetch.date, commits
+                finally:
+                    commits.close()
+                    fetch.cancel()
+        finally:
+            # stop fetching hours that won't be read
+            for fetch in pending:
+                fetch.cancel()
+
+
+def fetch_and_parse_commits_for_hours(hours, workers=Fetching.workers):
+    """
+    Fetch and parse commits for given hours and save them.
+    Commits are saved in the order of the given hours (see
+    fetch_commits_for_hours()). Hours that have already been saved
+    (in a previous run) are skipped, so an interrupted or partially
+    failed run can be simply run again. Commits that have already been
+    saved are dropped (see CommitDeduplicator) and their numbers reported.
+    :param hours: iterable of hours in yyyy-mm-dd-hh format
+    :param workers: number of archives downloaded at the same time
+    """
+    manifest = FetchManifest()
+    hours = (hour for hour in hours if not manifest.is_done(hour))
+    for date, commits in fetch_commits_for_hours(hours, workers,
+                                                 create_archive_cache()):
+        try:
+            duplicates = manifest.save(date, commits)
+        except FetchError as error:
+            # the hour isn't recorded, so it's fetched again by the next run
+            manifest.discard()
+            print(f"{error}, skipping.")
+            continue
+        finally:
+            sys.stdout.flush()
+        if duplicates:
+            print(f"Dropped {duplicates} duplicate commits.")
+    if manifest.duplicates:
+        print(f"Dropped {manifest.duplicates} duplicate commits in total.")
+    # index the new shards, so that date ranges can be analyzed right away
+    ShardIndex(manifest)
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 
@@ -24,6 +25,13 @@ def load_json(path):
     return json.load(file)
 
 
+def file_hash(path):
+    """SHA-256 of the content of a file (hexadecimal)."""
+    file = open(path, 'rb')
+    with file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
 def load_txt_into_set(path, skip_first_line=True):
     """Load a txt file (one value per line) into a set."""
     result = set()
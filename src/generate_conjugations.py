@@ -1,17 +1,35 @@
 #!/usr/bin/env python3
+import os
+import sys
+
 from config import Directories
 from conjugation_generator import ConjugationGenerator
 from file_utils import load_txt_into_set, open_file_dir_safe
+from lexicon import FORMS, is_lexicon_up_to_date, save_lexicon
+
+form_paths = {form: f"{Directories.processed_data}/{form}.txt"
+              for form in FORMS}
+if is_lexicon_up_to_date() \
+        and all(os.path.exists(path) for path in form_paths.values()):
+    print("Conjugations are up to date, skipping.")
+    sys.exit()
 
 infinitives = load_txt_into_set(f"{Directories.processed_data}/infinitive.txt")
 
 generator = ConjugationGenerator()
 
-forms = ['imperative', 'third_person', 'gerund', 'past_tense']
-for form in forms:
-    file = open_file_dir_safe(f"{Directories.processed_data}/{form}.txt", 'w')
+conjugations = {}
+for form in FORMS:
+    method = getattr(generator, form)
+    conjugations[form] = [method(word) for word in infinitives]
+
+    file = open_file_dir_safe(form_paths[form], 'w')
     with file:
-        for word in infinitives:
-            method = getattr(generator, form)
-            conjugation = method(word)
+        for conjugation in conjugations[form]:
             file.write(conjugation + "\n")
+
+lexicon = {}
+for form in FORMS:
+    for conjugation in conjugations[form]:
+        lexicon.setdefault(conjugation, form)
+save_lexicon(lexicon)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import argparse
+
+from config import Analyzing
+from commit_store import CommitStore
+from message_index import MessageIndex
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Index fetched commits by first words and verb forms"
+                    " of their messages (see query_messages.py).")
+    parser.add_argument('--chunk-size', type=int, default=Analyzing.chunk_size,
+                        help="number of commits read at once")
+    args = parser.parse_args()
+
+    indexed = MessageIndex(CommitStore()).build(args.chunk_size)
+    if indexed is None:
+        print("Index is up to date, skipping.")
+    else:
+        print(f"Indexed {indexed} commits.")
@@ -0,0 +1,66 @@
+import os
+import pickle
+import hashlib
+from functools import lru_cache
+
+from config import Directories
+
+# verb forms in the order of precedence (a word in more forms gets the first)
+FORMS = ['imperative', 'gerund', 'third_person', 'past_tense']
+
+LEXICON_PATH = f"{Directories.processed_data}/lexicon.pickle"
+# files read by generate_conjugations.py, the processed verbs change
+# with the raw files and with the scripts processing them
+SOURCES = [
+    f"{Directories.processed_data}/infinitive.txt",
+    f"{Directories.processed_data}/irregular_verbs.json",
+    # the conjugations change with the code generating them too
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 "conjugation_generator.py"),
+]
+
+
+def sources_key():
+    """Hashes of the files the lexicon is generated from."""
+    key = {}
+    for path in SOURCES:
+        file = open(path, 'rb')
+        with file:
+            key[os.path.basename(path)] = hashlib.sha256(file.read()).hexdigest()
+    return key
+
+
+def is_lexicon_up_to_date():
+    """Check whether the lexicon was generated from the current sources."""
+    if not os.path.exists(LEXICON_PATH):
+        return False
+
+    file = open(LEXICON_PATH, 'rb')
+    with file:
+        key = pickle.load(file)
+    return key == sources_key()
+
+
+def save_lexicon(lexicon):
+    """
+    Save the lexicon along with the hashes of its sources.
+    :param lexicon: dictionary of word -> form
+    """
+    os.makedirs(os.path.dirname(LEXICON_PATH), exist_ok=True)
+    file = open(LEXICON_PATH, 'wb')
+    with file:
+        pickle.dump(sources_key(), file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(lexicon, file, pickle.HIGHEST_PROTOCOL)
+
+
+@lru_cache(maxsize=1)
+def load_lexicon():
+    """
+    Load the lexicon generated by generate_conjugations.py.
+    It's loaded just once, callers share it and must not modify it.
+    :return: dictionary of word -> form
+    """
+    file = open(LEXICON_PATH, 'rb')
+    with file:
+        pickle.load(file)  # key
+        return pickle.load(file)
@@ -0,0 +1,155 @@
+import os
+import pickle
+import random
+import shutil
+
+import numpy as np
+
+from config import Directories, Analyzing
+from analyses import VerbFormAnalysis
+from fetch_manifest import FetchManifest
+from file_utils import load_json, save_json, open_file_dir_safe
+
+
+class MessageIndex:
+    """
+    Inverted index from first words and verb forms of messages to commits.
+
+    First words are normalized the same way as in FirstWordFrequencyAnalysis
+    (lowercase) and verb forms are detected the same way as in
+    VerbFormAnalysis ('non_verb' for messages without a verb), so example
+    commits of any bar of their charts can be found. All commits are indexed
+    (without the limit of commits by author).
+
+    Files in the directory:
+        postings.bin  positions of commits in the store (uint32),
+                      grouped by key, in the order of the store
+        keys.pickle   {'words': {word: (offset, count)}, 'forms': {...}}
+                      where offset is the first position in postings.bin
+        meta.json     ID of the store and the number of indexed commits
+    """
+
+    KINDS = ['words', 'forms']
+
+    def __init__(self, store, directory=Directories.message_index):
+        """
+        :param store: CommitStore of the indexed commits
+        :param directory: directory of the index files
+        """
+        self.store = store
+        self.directory = directory
+        self._keys = None
+
+    def path(self, filename):
+        return f"{self.directory}/{filename}"
+
+    def exists(self):
+        return os.path.exists(self.path('meta.json'))
+
+    def is_up_to_date(self, length=None):
+        """
+        :param length: number of commits to index, default is the number
+            of finished commits of the store (see FetchManifest)
+        """
+        if not self.exists():
+            return False
+        if length is None:
+            length = FetchManifest(self.store, recover=False).length
+        meta = load_json(self.path('meta.json'))
+        return meta['store'] == self.store.id and meta['length'] == length
+
+    def build(self, chunk_size=Analyzing.chunk_size):
+        """
+        Index all the finished commits of the store.
+
+        Every commit gets an ID of its word and of its form first
+        (4 + 1 bytes per commit), the IDs are then sorted at once,
+        so there are no lists of positions for millions of words.
+        :return: number of indexed commits or None if the index
+            is up to date
+        """
+        length = FetchManifest(self.store, recover=False).length
+        if self.is_up_to_date(length):
+            return None
+
+        verb_form = VerbFormAnalysis()
+        form_ids = {form: i
+                    for i, form in enumerate(verb_form.forms + ['non_verb'])}
+        word_ids = {}
+        words = np.empty(length, np.uint32)
+        forms = np.empty(length, np.uint8)
+
+        position = 0
+        for _, _, _, messages, _ in self.store.read_chunks(0, length,
+                                                           chunk_size):
+            for message in messages:
+                word = message.split(" ", 1)[0].lower()
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = word_ids[word] = len(word_ids)
+                words[position] = word_id
+
+                classified = verb_form.classify(message)
+                forms[position] = form_ids[classified[1] if classified
+                                           else 'non_verb']
+                position += 1
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        keys = {}
+        file = open_file_dir_safe(self.path('postings.bin'), 'wb')
+        with file:
+            offset = 0
+            for kind, ids, key_ids in ('words', words, word_ids), \
+                    ('forms', forms, form_ids):
+                # a stable sort keeps positions of a key in the store order
+                np.argsort(ids, kind='mergesort').astype(np.uint32).tofile(file)
+                counts = np.bincount(ids, minlength=len(key_ids)).tolist()
+                starts = np.cumsum([0] + counts[:-1]).tolist()
+                keys[kind] = {key: (offset + starts[i], counts[i])
+                              for key, i in key_ids.items() if counts[i]}
+                offset += length
+
+        file = open(self.path('keys.pickle'), 'wb')
+        with file:
+            pickle.dump(keys, file, pickle.HIGHEST_PROTOCOL)
+        save_json({'store': self.store.id, 'length': length},
+                  self.path('meta.json'))
+        return length
+
+    def keys(self, kind):
+        """:return: dictionary of (offset, count) by key"""
+        if self._keys is None:
+            file = open(self.path('keys.pickle'), 'rb')
+            with file:
+                self._keys = pickle.load(file)
+        return self._keys[kind]
+
+    def count(self, kind, key):
+        return self.keys(kind).get(key, (0, 0))[1]
+
+    def positions(self, kind, key, limit=None, sample=False):
+        """
+        Find commits of a key.
+        :param kind: 'words' (first words) or 'forms' (verb forms)
+        :param key: normalized first word or verb form
+        :param limit: maximal number of positions
+        :param sample: choose random commits instead of the first ones
+        :return: sorted list of positions of the commits in the store
+        """
+        offset, count = self.keys(kind).get(key, (0, 0))
+        read_count = count if sample or limit is None else min(count, limit)
+        file = open(self.path('postings.bin'), 'rb')
+        with file:
+            file.seek(offset * 4)
+            positions = np.fromfile(file, np.uint32, read_count).tolist()
+        if sample and limit is not None and limit < len(positions):
+            positions = sorted(random.sample(positions, limit))
+        return positions
+
+    def commits(self, kind, key, limit=None, sample=False):
+        """
+        Read commits of a key, see positions().
+        :return: list of (author, repo, lines, message, time) tuples
+        """
+        return self.store.read_commits(
+            self.positions(kind, key, limit, sample))
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from time import gmtime, strftime
+
+from config import Directories, Fetching, Analyzing
+from file_utils import load_json, save_json, file_hash
+from lexicon import FORMS, LEXICON_PATH
+
+# hashes of inputs of the stages from their last successful runs
+STATE_PATH = f"{Directories.processed_data}/pipeline.json"
+
+ANALYSIS_NAMES = ['word_frequency', 'first_word_frequency', 'verb_form',
+                  'message_length', 'message_line_count', 'binary']
+
+
+class Stage:
+    """
+    Stage of the pipeline, a script run with its inputs and outputs.
+
+    A stage is up to date when all its outputs exist and they are newer
+    than all its inputs, or when the content of its inputs hasn't changed
+    since its last successful run (e.g. a file was just touched, or the
+    script kept its outputs because they were up to date).
+    """
+
+    def __init__(self, name, command, inputs=(), outputs=(), after=(),
+                 always=False):
+        """
+        :param name: name of the stage
+        :param command: script and its arguments (run in the src directory)
+        :param inputs: paths of the files the stage reads
+        :param outputs: paths of the files the stage writes
+        :param after: names of the stages that have to finish first
+        :param always: run the stage even if it's up to date
+            (for stages that skip the finished work themselves, like fetching)
+        """
+        self.name = name
+        self.command = command
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.always = always
+
+    def input_hashes(self):
+        return {path: file_hash(path)
+                for path in self.inputs if os.path.exists(path)}
+
+    def is_up_to_date(self, state):
+        """
+        :param state: dictionary of input hashes by stage name
+            (from the last successful runs)
+        """
+        if self.always or not all(map(os.path.exists, self.outputs)):
+            return False
+
+        oldest_output = min(map(os.path.getmtime, self.outputs),
+                            default=float('inf'))
+        newest_input = max((os.path.getmtime(path) for path in self.inputs
+                            if os.path.exists(path)), default=0)
+        if newest_input <= oldest_output:
+            return True
+        return state.get(self.name) == self.input_hashes()
+
+    def run(self):
+        """
+        Run the script, printing its output prefixed with the stage name.
+        :return: exit code of the script
+        """
+        process = subprocess.Popen(
+            [sys.executable] + self.command,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True)
+        with process.stdout:
+            for line in process.stdout:
+                log(f"[{self.name}] {line.rstrip()}")
+        return process.wait()
+
+
+output_lock = threading.Lock()
+
+
+def log(message):
+    with output_lock:
+        print(message)
+        sys.stdout.flush()
+
+
+def fetch_command(period, workers):
+    """
+    Command fetching commits of a period.
+    :param period: list of [yyyy-mm-dd-hh], [yyyy, mm] or [yyyy]
+    :return: list of the script and its arguments
+    """
+    if len(period) == 2:
+        return ['fetch_commits_for_month.py'] + period + [str(workers)]
+    if '-' in period[0]:
+        return ['fetch_commits.py', period[0]]
+    return ['fetch_commits_for_year.py', period[0], str(workers)]
+
+
+def pipeline_stages(period=None, workers=Fetching.workers,
+                    processes=Analyzing.processes):
+    """
+    Create the stages of the whole pipeline (the order in README).
+    :param period: period to fetch (see fetch_command()),
+        None means no fetching (analyzing the commits fetched before)
+    :param workers: number of archives downloaded at the same time
+    :param processes: number of processes of the analysis
+    :return: list of stages
+    """
+    processed = Directories.processed_data
+    raw = Directories.raw_data
+    manifest = f"{Directories.commits}/manifest.jsonl"
+    results = [f"{Directories.json_outputs}/{name}.json"
+               for name in ANALYSIS_NAMES]
+
+    stages = [
+        Stage('verbs', ['process_verbs.py'],
+              inputs=[f"{raw}/verbs.txt", 'process_verbs.py'],
+              outputs=[f"{processed}/infinitive.txt"]),
+        Stage('irregular_verbs', ['process_irregular_verbs.py'],
+              inputs=[f"{raw}/irregular_verbs.html",
+                      'process_irregular_verbs.py'],
+              outputs=[f"{processed}/irregular_verbs.json"]),
+        Stage('conjugations', ['generate_conjugations.py'],
+              inputs=[f"{processed}/infinitive.txt",
+                      f"{processed}/irregular_verbs.json",
+                      'conjugation_generator.py'],
+              outputs=[f"{processed}/{form}.txt" for form in FORMS]
+              + [LEXICON_PATH],
+              after=['verbs', 'irregular_verbs']),
+    ]
+    if period:
+        stages.append(Stage('fetch', fetch_command(period, workers),
+                            outputs=[manifest], always=True))
+    stages += [
+        Stage('analyze', ['analyze.py', str(processes)],
+              inputs=[manifest, LEXICON_PATH, f"{raw}/stopwords.txt"],
+              outputs=results,
+              after=['conjugations'] + (['fetch'] if period else [])),
+        Stage('plot', ['plot.py'],
+              inputs=results,
+              outputs=[f"{Directories.charts}/render_cache.json"],
+              after=['analyze']),
+    ]
+    return stages
+
+
+def run_pipeline(stages, force=False, dry_run=False):
+    """
+    Run stages that aren't up to date, each one after the stages it needs.
+    Stages that don't depend on each other run at the same time
+    (e.g. processing verbs while fetching). When a stage fails,
+    the stages after it are not run.
+    :param force: run all the stages
+    :param dry_run: just print which stages would run
+    :return: whether all the stages succeeded
+    """
+    state = load_json(STATE_PATH) if os.path.exists(STATE_PATH) else {}
+    waiting = {stage.name: stage for stage in stages}
+    finished = set()
+    failed = set()
+    running = {}
+
+    def start_ready(executor):
+        progress = True
+        while progress:
+            progress = False
+            for stage in list(waiting.values()):
+                if any(name in failed for name in stage.after):
+                    log(f"Skipping {stage.name}, a stage before it failed.")
+                    failed.add(stage.name)
+                    del waiting[stage.name]
+                elif all(name in finished for name in stage.after):
+                    del waiting[stage.name]
+                    # a skipped stage can make other stages ready
+                    progress = True
+                    if not force and stage.is_up_to_date(state):
+                        log(f"{stage.name} is up to date, skipping.")
+                        finished.add(stage.name)
+                        continue
+                    time = strftime("%H:%M:%S", gmtime())
+                    log(f"[{time}] Running {stage.name}:"
+                        f" {' '.join(stage.command)}")
+                    if dry_run:
+                        finished.add(stage.name)
+                    else:
+                        running[executor.submit(stage.run)] = stage
+
+    with ThreadPoolExecutor(max_workers=max(len(stages), 1)) as executor:
+        while waiting or running:
+            start_ready(executor)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                if future.result() == 0:
+                    finished.add(stage.name)
+                    state[stage.name] = stage.input_hashes()
+                    save_json(state, STATE_PATH)
+                else:
+                    log(f"{stage.name} failed"
+                        f" with exit code {future.result()}.")
+                    failed.add(stage.name)
+
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run the whole pipeline (processing verbs, fetching,"
+                    " analyzing and plotting), skipping stages"
+                    " that are up to date.")
+    parser.add_argument('period', nargs='*',
+                        help="fetch commits of an hour (yyyy-mm-dd-hh),"
+                             " a month (yyyy mm) or a year (yyyy),"
+                             " nothing means no fetching")
+    parser.add_argument('--workers', type=int, default=Fetching.workers,
+                        help="number of archives downloaded at the same time")
+    parser.add_argument('--processes', type=int, default=Analyzing.processes,
+                        help="number of processes of the analysis")
+    parser.add_argument('--force', action='store_true',
+                        help="run all the stages even if they are up to date")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="just print which stages would run")
+    args = parser.parse_args()
+    if len(args.period) > 2:
+        parser.error("period is yyyy-mm-dd-hh, yyyy mm or yyyy")
+
+    stages = pipeline_stages(args.period or None, args.workers, args.processes)
+    if not run_pipeline(stages, args.force, args.dry_run):
+        sys.exit(1)
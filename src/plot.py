@@ -1,22 +1,97 @@
 #!/usr/bin/env python3
-from config import Directories
-from plotters import *
-from os import makedirs
-
-makedirs(Directories.charts, exist_ok=True)
-
-plotters = [
-    FirstWordFrequencyPlotter(),
-    WordFrequencyPlotter(),
-    VerbFormOverviewPlotter(),
-    ImperativePlotter(),
-    GerundWordsPlotter(),
-    ThirdPersonWordsPlotter(),
-    PastTenseWordsPlotter(),
-    MessageLengthPlotter(),
-    MessageLinesPlotter(),
-    BinaryAnalysesPlotter(),
-]
-
-for plotter in plotters:
+import argparse
+import hashlib
+import inspect
+import json
+import os
+from multiprocessing import Pool
+
+from config import Directories, Plotting
+from file_utils import load_json, save_json, file_hash
+from plotters import all_plotters
+
+
+def render_key(plotter, input_hash):
+    """
+    Key of a chart in the render cache.
+    It changes when the input file, the parameters of the plotter
+    or the code of the plotter change.
+    """
+    code_hash = file_hash(inspect.getsourcefile(type(plotter)))
+    key = json.dumps([input_hash, code_hash, plotter.parameters],
+                     sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def render(plotter):
     plotter.plot()
+    return plotter
+
+
+def plot(plotters, processes=Plotting.processes, force=False):
+    """
+    Render charts that aren't up to date.
+
+    Charts whose input file, parameters and code haven't changed since
+    they were rendered are skipped (see render_key()). Input files are
+    loaded just once and shared by plotters that need the same one.
+    :param plotters: list of plotters
+    :param processes: number of processes rendering the charts
+    :param force: render all the charts
+    """
+    os.makedirs(Directories.charts, exist_ok=True)
+    cache_path = f"{Directories.charts}/render_cache.json"
+    cache = {}
+    if os.path.exists(cache_path) and not force:
+        cache = load_json(cache_path)
+
+    input_hashes = {}
+    inputs = {}
+    outdated = []
+    for plotter in plotters:
+        input_name = plotter.input_file_name
+        if input_name not in input_hashes:
+            input_hashes[input_name] = file_hash(plotter.input_path)
+
+        key = render_key(plotter, input_hashes[input_name])
+        if cache.get(plotter.name) == key \
+                and all(map(os.path.exists, plotter.output_paths)):
+            continue
+
+        if input_name not in inputs:
+            inputs[input_name] = load_json(plotter.input_path)
+        plotter.data = inputs[input_name]
+        outdated.append((plotter, key))
+
+    keys = {plotter.name: key for plotter, key in outdated}
+    if processes > 1:
+        with Pool(processes) as pool:
+            rendered = pool.imap_unordered(
+                render, [plotter for plotter, _ in outdated])
+            for plotter in rendered:
+                cache[plotter.name] = keys[plotter.name]
+    else:
+        for plotter, key in outdated:
+            render(plotter)
+            cache[plotter.name] = key
+    save_json(cache, cache_path)
+
+    print(f"Rendered {len(outdated)} charts"
+          f" ({len(plotters) - len(outdated)} are up to date).")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plot results of analyses.")
+    parser.add_argument('processes', type=int, nargs='?',
+                        default=Plotting.processes,
+                        help="number of processes rendering the charts")
+    parser.add_argument('--force', action='store_true',
+                        help="render also charts that are up to date")
+    parser.add_argument('--formats', nargs='+', default=Plotting.formats,
+                        help="formats of the charts, e.g. png svg pdf")
+    parser.add_argument('--dpi', type=int, default=Plotting.dpi,
+                        help="resolution of raster formats")
+    args = parser.parse_args()
+
+    plot(all_plotters(formats=args.formats, dpi=args.dpi), args.processes,
+         args.force)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import argparse
+import os
+
+from config import Plotting
+from plot import plot
+from plotters import SHARES, TimeSeriesPlotter, share_key
+from time_buckets import GRANULARITIES
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Plot the share of a key in the results of an analysis"
+                    " over time (time series are saved by analyze.py"
+                    " --buckets).")
+    parser.add_argument('analysis', choices=SHARES)
+    parser.add_argument('key',
+                        help="e.g. a verb form (imperative), a word (fix),"
+                             " a condition (full_stop) or a length")
+    parser.add_argument('granularity', choices=GRANULARITIES)
+    parser.add_argument('--formats', nargs='+', default=Plotting.formats,
+                        help="formats of the chart, e.g. png svg pdf")
+    parser.add_argument('--dpi', type=int, default=Plotting.dpi,
+                        help="resolution of raster formats")
+    args = parser.parse_args()
+
+    try:
+        key = share_key(args.analysis, args.key)
+    except ValueError as e:
+        parser.error(str(e))
+
+    plotter = TimeSeriesPlotter(args.analysis, key, args.granularity,
+                                formats=args.formats, dpi=args.dpi)
+    if not os.path.exists(plotter.input_path):
+        parser.error(f"There is no time series {plotter.input_path},"
+                     f" run analyze.py --buckets {args.granularity} first.")
+    plot([plotter])
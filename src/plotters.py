@@ -1,11 +1,20 @@
 from abc import ABC, abstractmethod
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
 
-from config import Directories
+from config import Directories, Plotting
 from file_utils import load_json
+from lexicon import FORMS
+
+
+def pyplot():
+    """
+    Import matplotlib.pyplot.
+    It's imported only when a chart is rendered as it takes a while,
+    so that computing the values (see export_series.py) is fast.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
 
 
 class Plotter(ABC):
@@ -13,12 +22,29 @@ class Plotter(ABC):
     Base plotter that plots a plot (haha).
 
     Each plotter creates one charts.
-    Charts are saved into 'outputs/charts' directory in png and svg format.
+    Charts are saved into 'outputs/charts' directory in the given formats.
     """
 
-    def __init__(self):
-        self.data = \
-            load_json(f"{Directories.json_outputs}/{self.input_file_name}.json")
+    def __init__(self, data=None, formats=Plotting.formats, dpi=Plotting.dpi):
+        """
+        :param data: data of the input file, it's loaded when needed
+            if not given (plotters with the same input can share it)
+        :param formats: list of formats of the charts (file extensions)
+        :param dpi: resolution of raster formats
+        """
+        self._data = data
+        self.formats = formats
+        self.dpi = dpi
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = load_json(self.input_path)
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
 
     @property
     @abstractmethod
@@ -31,6 +57,30 @@ class Plotter(ABC):
         """Name of the file to load the data from."""
         return self.name
 
+    @property
+    def input_path(self):
+        return f"{Directories.json_outputs}/{self.input_file_name}.json"
+
+    @property
+    def output_paths(self):
+        """Paths of the chart files."""
+        return [f"{Directories.charts}/{self.name}.{extension}"
+                for extension in self.formats]
+
+    @property
+    def parameters(self):
+        """Everything besides the data that the chart depends on."""
+        return {
+            'class': type(self).__name__,
+            'title': self.title,
+            'x_label': self.x_label,
+            'y_label': self.y_label,
+            'text_color': self.text_color,
+            'font_family': self.font_family,
+            'outputs': self.output_paths,
+            'dpi': self.dpi,
+        }
+
     @property
     @abstractmethod
     def title(self):
@@ -60,6 +110,7 @@ class Plotter(ABC):
 
     def plot(self):
         """Compute the values and create a chart."""
+        plt = pyplot()
         plt.rcParams['axes.labelcolor'] = self.text_color
         plt.rcParams['xtick.color'] = self.text_color
         plt.rcParams['ytick.color'] = self.text_color
@@ -74,9 +125,8 @@ class Plotter(ABC):
 
         plt.tight_layout()
 
-        plt.savefig(f"{Directories.charts}/{self.name}.png", transparent=True, dpi=300)
-        plt.savefig(f"{Directories.charts}/{self.name}.svg")
-        plt.savefig(f"{Directories.charts}/{self.name}.pdf")
+        for path, extension in zip(self.output_paths, self.formats):
+            plt.savefig(path, dpi=self.dpi, transparent=extension == 'png')
         plt.close()
 
 
@@ -94,6 +144,8 @@ class BarPlotter(Plotter):
         return "#FED530"
 
     def init_plot(self):
+        import numpy as np
+        plt = pyplot()
         values = self.compute_values()
 
         [x, y] = list(zip(*values))
@@ -119,6 +171,7 @@ class LinePlotter(Plotter):
         pass
 
     def init_plot(self):
+        plt = pyplot()
         values = self.compute_values()
 
         [x, y] = list(zip(*values))
@@ -126,6 +179,18 @@ class LinePlotter(Plotter):
         plt.plot(x, y, color="#FED530")
 
 
+def word_counts(state):
+    """
+    :param state: results of WordFrequencyAnalysis, a list of words or
+        a dictionary with the top words and the total number of words
+        when they are counted approximately (only the top words are kept)
+    :return: tuple of (list of words with their counts, number of words)
+    """
+    if isinstance(state, dict):
+        return state['words'], state['total']
+    return state, sum(x['count'] for x in state)
+
+
 class WordFrequencyPlotter(BarPlotter):
     @property
     def name(self):
@@ -144,9 +209,9 @@ class WordFrequencyPlotter(BarPlotter):
         return 10
 
     def compute_values(self):
-        total_count = sum(x['count'] for x in self.data)
+        words, total_count = word_counts(self.data)
 
-        top_words = self.data[:self.n_top_words]
+        top_words = words[:self.n_top_words]
         values = [
             (x['word'], x['count'] * 100 / total_count)
             for x in top_words
@@ -331,3 +396,132 @@ class BinaryAnalysesPlotter(BarPlotter):
         values.sort(key=lambda x: x[1], reverse=True)
 
         return values
+
+
+def share(count, total_count):
+    return count * 100 / total_count if total_count else 0
+
+
+def word_share(state, word):
+    words, total_count = word_counts(state)
+    count = next((x['count'] for x in words if x['word'] == word), 0)
+    return share(count, total_count)
+
+
+# conditions of BinaryAnalyses (importing analyses would load numpy
+# and the lexicon just to check a key)
+BINARY_CONDITIONS = ['total', 'capital_letter', 'full_stop', 'capslock',
+                     'non_ascii_chars']
+
+# share of a key in the state of an analysis (in percents) by analysis name
+SHARES = {
+    'word_frequency': word_share,
+    'first_word_frequency': word_share,
+    'verb_form': lambda state, form: share(
+        state['total_counts'][form], sum(state['total_counts'].values())),
+    'message_length': lambda state, length: share(
+        state.get(length, 0), sum(state.values())),
+    'message_line_count': lambda state, lines: share(
+        state.get(lines, 0), sum(state.values())),
+    'binary': lambda state, condition: share(state[condition], state['total']),
+}
+
+
+def share_key(analysis, key):
+    """
+    Check a key of a time series given by the user (see TimeSeriesPlotter).
+    :param analysis: name of the analysis (one of SHARES)
+    :param key: key in the results of the analysis
+    :return: the key as it is in the results (words are lowercase)
+    :raise ValueError: if the analysis or the key isn't valid
+    """
+    if analysis not in SHARES:
+        raise ValueError(f"Unknown analysis {analysis}, use one of"
+                         f" {', '.join(SHARES)}.")
+    if analysis in ('word_frequency', 'first_word_frequency'):
+        if not key or " " in key:
+            raise ValueError(f"Key of {analysis} must be a single word.")
+        return key.lower()
+    if analysis in ('message_length', 'message_line_count'):
+        if not key.isdigit():
+            raise ValueError(f"Key of {analysis} must be a number.")
+        return str(int(key))
+
+    keys = FORMS + ['non_verb'] if analysis == 'verb_form' \
+        else BINARY_CONDITIONS
+    if key not in keys:
+        raise ValueError(f"Unknown key {key} of {analysis}, use one of"
+                         f" {', '.join(keys)}.")
+    return key
+
+
+class TimeSeriesPlotter(LinePlotter):
+    """
+    Plotter of the share of a key (e.g. a verb form or a word)
+    in the results of an analysis over time (see analyze.py --buckets).
+    """
+
+    def __init__(self, analysis, key, granularity, **kwargs):
+        """
+        :param analysis: name of the analysis (one of SHARES)
+        :param key: key in the results, e.g. 'imperative' for verb_form
+        :param granularity: granularity of the time series
+        """
+        self.analysis = analysis
+        self.key = key
+        self.granularity = granularity
+        super().__init__(**kwargs)
+
+    @property
+    def name(self):
+        return f'{self.analysis}_{self.key}_by_{self.granularity}'
+
+    @property
+    def input_file_name(self):
+        return f'{self.analysis}_by_{self.granularity}'
+
+    @property
+    def title(self):
+        key = str(self.key).replace("_", " ").capitalize()
+        return f"{key} over time"
+
+    @property
+    def x_label(self):
+        return self.granularity.capitalize()
+
+    def compute_values(self):
+        return [(bucket, SHARES[self.analysis](state, self.key))
+                for bucket, state in self.data['buckets'].items()]
+
+    @property
+    def max_ticks(self):
+        return 12
+
+    def init_plot(self):
+        plt = pyplot()
+        values = self.compute_values()
+
+        [x, y] = list(zip(*values))
+
+        plt.plot(range(len(x)), y, color="#FED530")
+        step = max(1, -(-len(x) // self.max_ticks))
+        plt.xticks(range(0, len(x), step), x[::step], rotation=70)
+
+
+def all_plotters(**kwargs):
+    """
+    Create all the plotters run by plot.py.
+    :param kwargs: arguments of the plotters (see Plotter)
+    """
+    return [
+        FirstWordFrequencyPlotter(**kwargs),
+        WordFrequencyPlotter(**kwargs),
+        VerbFormOverviewPlotter(**kwargs),
+        ImperativePlotter(**kwargs),
+        GerundWordsPlotter(**kwargs),
+        ThirdPersonWordsPlotter(**kwargs),
+        PastTenseWordsPlotter(**kwargs),
+        MessageLengthPlotter(**kwargs),
+        MessageLinesPlotter(**kwargs),
+        BinaryAnalysesPlotter(**kwargs),
+    ]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import time
+
+from commit_store import CommitStore
+from lexicon import FORMS
+from message_index import MessageIndex
+
+FIELDS = ['message', 'author', 'repo']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Show example commits with a first word or a verb form"
+                    " (from the index built by index_messages.py).")
+    parser.add_argument('key',
+                        help="first word of the messages (any case),"
+                             " or a verb form with --form")
+    parser.add_argument('--form', action='store_true',
+                        help="the key is a verb form: "
+                             + ", ".join(FORMS + ['non_verb']))
+    parser.add_argument('-n', type=int, default=10,
+                        help="number of commits to show")
+    parser.add_argument('--show', choices=FIELDS, nargs='+', default=FIELDS,
+                        help="fields of the commits to show")
+    parser.add_argument('--random', action='store_true',
+                        help="show random commits instead of the first ones")
+    args = parser.parse_args()
+
+    store = CommitStore()
+    index = MessageIndex(store)
+    if not index.exists():
+        print("Index is missing, run index_messages.py.", file=sys.stderr)
+        sys.exit(1)
+    if not index.is_up_to_date():
+        print("Index is out of date, run index_messages.py.",
+              file=sys.stderr)
+
+    start = time.perf_counter()
+    kind = 'forms' if args.form else 'words'
+    key = args.key if args.form else args.key.lower()
+    commits = index.commits(kind, key, args.n, args.random)
+    elapsed = time.perf_counter() - start
+
+    for author, repo, _, message, _ in commits:
+        values = {'message': message, 'author': author, 'repo': repo}
+        print("\t".join(values[field] for field in args.show))
+    print(f"{len(commits)} of {index.count(kind, key)} commits"
+          f" ({elapsed * 1000:.0f} ms).", file=sys.stderr)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import sys
+import gzip
+import zlib
+from json.decoder import JSONDecodeError
+
+from config import Directories
+from archive_cache import ArchiveCache
+from commit_store import CommitStore
+from fetch_commits import parse_commits
+from fetch_manifest import FetchManifest
+
+
+def hour_key(hour):
+    """
+    Sort key for hours in yyyy-mm-dd-hh format (hours aren't zero-padded),
+    commits of an unknown hour go first.
+    """
+    if hour == FetchManifest.UNKNOWN_HOUR:
+        return ()
+    return tuple(int(x) for x in hour.split("-"))
+
+
+def copy_commits(store, start, end):
+    """
+    Read commits of a store in the format of fetch_commits().
+    :return: list of (author, repo, lines, message, time, sha) tuples
+    """
+    authors = store.author_names
+    repos = store.repo_names
+    shas = store.read_shas(start, end)
+    return [(authors[author], repos[repo], lines, message, time,
+             sha.hex() if any(sha) else None)
+            for (author, repo, lines, message, time), sha
+            in zip(store.read(start, end), shas)]
+
+
+def parse_cached_commits(cache, hour):
+    """:return: list of commits of a cached archive, see fetch_commits()"""
+    cached_file = cache.open(hour)
+    with cached_file, gzip.GzipFile(fileobj=cached_file) as file:
+        return list(parse_commits(file))
+
+
+def reparse_commits(prefix=""):
+    """
+    Parse commits again from cached archives, without downloading anything.
+
+    A new commit store is built next to the current one and replaces it
+    only when it's complete. Saved hours that don't start with the prefix
+    are copied from the current store. Nothing is changed if an archive
+    of a saved hour with the prefix isn't cached (any more), its commits
+    would be lost.
+    :param prefix: parse only hours starting with it (e.g. 2017-03)
+    :return: whether the store has been replaced
+    """
+    cache = ArchiveCache()
+    old_store = CommitStore()
+    saved = {entry['hour']: (entry['start'], entry['end'])
+             for entry in FetchManifest(old_store, recover=False).entries()}
+    cached = {hour for hour in cache.hours() if hour.startswith(prefix)}
+
+    missing = sorted((hour for hour in saved
+                      if hour.startswith(prefix) and hour not in cached
+                      and hour != FetchManifest.UNKNOWN_HOUR), key=hour_key)
+    if missing:
+        examples = ", ".join(missing[:3]) + (", ..." if len(missing) > 3
+                                             else "")
+        print(f"Archives of {len(missing)} saved hours are not cached"
+              f" ({examples}), their commits would be lost. Fetch them again"
+              f" first or choose a prefix without them."
+              f" The store is unchanged.")
+        return False
+    if not cached:
+        print(f"There are no cached archives starting with '{prefix}',"
+              f" the store is unchanged.")
+        return False
+
+    directory = f"{Directories.commits}.reparse"
+    shutil.rmtree(directory, ignore_errors=True)
+    manifest = FetchManifest(CommitStore(directory))
+
+    for hour in sorted(cached | set(saved), key=hour_key):
+        commits = None
+        if hour in cached:
+            print(f"Parsing commits for {hour}")
+            try:
+                commits = parse_cached_commits(cache, hour)
+            except (JSONDecodeError, EOFError, zlib.error, OSError) as e:
+                print(f"Error in reading the archive ({e}), "
+                      + ("keeping the saved commits." if hour in saved
+                         else "skipping."))
+        if commits is None and hour in saved:
+            commits = copy_commits(old_store, *saved[hour])
+        if commits is not None:
+            manifest.save(hour, commits)
+    if manifest.duplicates:
+        print(f"Dropped {manifest.duplicates} duplicate commits.")
+    if not os.path.exists(directory):
+        print("No commits have been parsed, the store is unchanged.")
+        return False
+
+    backup = f"{Directories.commits}.old"
+    shutil.rmtree(backup, ignore_errors=True)
+    if os.path.exists(Directories.commits):
+        os.replace(Directories.commits, backup)
+    os.replace(directory, Directories.commits)
+    shutil.rmtree(backup)
+    return True
+
+
+if __name__ == '__main__':
+    if not reparse_commits(sys.argv[1] if len(sys.argv) > 1 else ""):
+        sys.exit(1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import time
+
+from rollups import Rollups
+from shard_index import check_date
+
+
+def report(since=None, until=None):
+    """
+    Save the results of a range of dates from rollups (see Rollups)
+    into outputs/json, the same as analyze.py.
+    :param since: first date (yyyy, yyyy-mm, yyyy-mm-dd or yyyy-mm-dd-hh)
+    :param until: last date (included)
+    :return: whether there are any commits in the range
+    """
+    start = time.perf_counter()
+    rollups = Rollups()
+    cover = rollups.cover(since, until)
+    analyses = rollups.merge(cover)
+    if analyses is None:
+        return False
+
+    for analysis in analyses:
+        analysis.finalize()
+        analysis.save()
+    print(f"Merged {len(cover)} rollups"
+          f" in {(time.perf_counter() - start) * 1000:.0f} ms.")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Report the results of a range of dates from rollups"
+                    " saved by analyze.py --rollups.")
+    parser.add_argument('--since',
+                        help="first date (yyyy, yyyy-mm, yyyy-mm-dd"
+                             " or yyyy-mm-dd-hh)")
+    parser.add_argument('--until', help="last date (included)")
+    args = parser.parse_args()
+    for date in args.since, args.until:
+        if date:
+            try:
+                # rollups go down to hours
+                check_date(date, 'hour')
+            except ValueError as error:
+                parser.error(str(error))
+
+    if not report(args.since, args.until):
+        print("There are no rollups in the range,"
+              " run analyze.py --rollups first.")
+        sys.exit(1)
@@ -0,0 +1,197 @@
+import calendar
+import os
+import pickle
+import shutil
+
+from config import Directories
+from file_utils import load_json, save_json, open_file_dir_safe
+from time_buckets import bucket_key
+
+
+def date_range(since=None, until=None):
+    """
+    Convert a range of dates into a range of times.
+    :param since: first date (yyyy, yyyy-mm, yyyy-mm-dd or yyyy-mm-dd-hh)
+    :param until: last date (included), in the same format as since
+    :return: tuple of (start, end) Unix timestamps (end excluded),
+        None for no limit
+    """
+    def parse(date):
+        parts = [int(part) for part in date.split("-")]
+        if not 1 <= len(parts) <= 4:
+            raise ValueError(f"Date {date} is not in yyyy-mm-dd-hh format.")
+        return parts + [1, 1, 0][len(parts) - 1:]
+
+    def after(year, month, day, hour, precision):
+        """Start of the period following the given one."""
+        if precision == 1:
+            return calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+        if precision == 2:
+            return calendar.timegm((year + month // 12, month % 12 + 1, 1,
+                                    0, 0, 0))
+        step = 86400 if precision == 3 else 3600
+        return calendar.timegm((year, month, day, hour, 0, 0)) + step
+
+    start = end = None
+    if since:
+        start = calendar.timegm(tuple(parse(since)) + (0, 0))
+    if until:
+        end = after(*parse(until), len(until.split("-")))
+    return start, end
+
+
+class Rollups:
+    """
+    Materialized partial (not finalized) analyses by hours, days and months.
+
+    Analyzer (with rollups) saves the analyses of every hour of commits,
+    merged into the days and months they belong to. A report of any
+    range of dates then merges the fewest rollups covering the range
+    (whole months, then whole days, then hours) and finalizes them,
+    without reading any commits.
+
+    Rollups are made of the commits analyzed by a run over the whole store,
+    i.e. the limit of commits by author applies to all the commits
+    (the same as in time series, see TimeBuckets), not to the commits
+    of the reported range like in Analyzer with a date range.
+
+    Files are <directory>/<level>/<key>.pickle (e.g. day/2017-01-02.pickle)
+    and meta.json with the store, the analyses and the number of commits
+    the rollups are made of.
+    """
+
+    LEVELS = ['month', 'day', 'hour']
+
+    def __init__(self, directory=Directories.rollups):
+        self.directory = directory
+        self.meta_path = f"{directory}/meta.json"
+
+    def path(self, level, key):
+        return f"{self.directory}/{level}/{key}.pickle"
+
+    def meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        return load_json(self.meta_path)
+
+    def position(self, store_id, names):
+        """
+        :return: number of commits of a store the rollups of the analyses
+            are made of (zero if they are of another store or analyses)
+        """
+        meta = self.meta()
+        if meta is None or meta['store'] != store_id \
+                or meta['names'] != names:
+            return 0
+        return meta['position']
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def load(self, level, key):
+        path = self.path(level, key)
+        if not os.path.exists(path):
+            return None
+        file = open(path, 'rb')
+        with file:
+            return pickle.load(file)
+
+    def dump(self, level, key, analyses):
+        path = self.path(level, key)
+        file = open_file_dir_safe(path + ".part", 'wb')
+        with file:
+            pickle.dump(analyses, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".part", path)
+
+    def update(self, time_buckets, store_id, names, position):
+        """
+        Add hourly analyses and update the days and months they belong to.
+        Analyses of an hour that already has a rollup (from a previous
+        incremental run) are merged into it.
+        :param time_buckets: TimeBuckets with the hour granularity
+        :param store_id: ID of the commit store
+        :param names: names of the analyses
+        :param position: number of commits the rollups are made of now
+        """
+        days = set()
+        for key in time_buckets.keys():
+            analyses = self.load('hour', key)
+            for partial in time_buckets.partials(key):
+                analyses = merge_analyses(analyses, partial)
+            self.dump('hour', key, analyses)
+            days.add(key[:10])
+        time_buckets.remove_directory()
+
+        for day in sorted(days):
+            self.dump('day', day, self.merge(
+                ('hour', f"{day}-{hour:02}") for hour in range(24)))
+        for month in sorted({day[:7] for day in days}):
+            self.dump('month', month, self.merge(
+                ('day', f"{month}-{day:02}") for day in range(1, 32)))
+
+        save_json({'store': store_id, 'names': names, 'position': position},
+                  self.meta_path)
+
+    def merge(self, rollups):
+        """
+        Merge rollups in the given order (missing ones are skipped).
+        :param rollups: iterable of (level, key) tuples
+        :return: merged list of analyses or None if there's no rollup
+        """
+        analyses = None
+        for level, key in rollups:
+            partial = self.load(level, key)
+            if partial is not None:
+                analyses = merge_analyses(analyses, partial)
+        return analyses
+
+    def cover(self, since=None, until=None):
+        """
+        Find the fewest rollups covering a range of dates.
+        :param since: first date (see date_range()), None means the first
+            rollup
+        :param until: last date (included), None means the last rollup
+        :return: list of (level, key) tuples in chronological order
+        """
+        months = sorted(name[:-len(".pickle")] for name in
+                        os.listdir(f"{self.directory}/month")
+                        if name.endswith(".pickle")) \
+            if os.path.exists(f"{self.directory}/month") else []
+        if not months:
+            return []
+
+        start, end = date_range(since, until)
+        first, last = date_range(months[0], months[-1])
+        start = first if start is None else max(start, first)
+        end = last if end is None else min(end, last)
+
+        rollups = []
+        time = start
+        while time < end:
+            # the largest level starting at the time and ending in the range
+            for level in self.LEVELS:
+                key = bucket_key(time, level)
+                level_start, level_end = date_range(key, key)
+                if level_start == time and level_end <= end:
+                    break
+            if os.path.exists(self.path(level, key)):
+                rollups.append((level, key))
+            time = level_end
+        return rollups
+
+    def report(self, since=None, until=None):
+        """
+        Merge the rollups of a range of dates.
+        :return: list of merged analyses (not finalized yet),
+            None if there are no commits in the range
+        """
+        return self.merge(self.cover(since, until))
+
+
+def merge_analyses(analyses, partial):
+    """Merge a partial list of analyses into another one (or None)."""
+    if analyses is None:
+        return partial
+    for analysis, partial_analysis in zip(analyses, partial):
+        analysis.merge(partial_analysis)
+    return analyses
@@ -0,0 +1,132 @@
+import os
+from datetime import datetime
+
+from config import Fetching
+from file_utils import load_json, save_json
+from time_buckets import GRANULARITIES, bucket_key, hour_time
+
+
+def check_date(date, granularity=Fetching.shard_granularity):
+    """
+    Check that a date is in a format of shard keys that aren't finer
+    than the granularity (yyyy, yyyy-mm, yyyy-mm-dd, or yyyy-mm-dd-hh
+    for the hour granularity), zero-padded, so it can be compared with keys.
+    :raise ValueError: if the date isn't valid
+    """
+    key_length = len(bucket_key(0, granularity))
+    formats = [date_format for name, date_format in GRANULARITIES.items()
+               if len(bucket_key(0, name)) <= key_length]
+    for date_format in formats:
+        try:
+            if datetime.strptime(date, date_format) \
+                    .strftime(date_format) == date:
+                return
+        except ValueError:
+            pass
+    examples = ", ".join(date_format.replace("%Y", "yyyy").replace("%m", "mm")
+                         .replace("%d", "dd").replace("%H", "hh")
+                         for date_format in reversed(formats))
+    raise ValueError(f"Invalid date {date}, use one of {examples}"
+                     f" (commits are indexed by {granularity}).")
+
+
+class ShardIndex:
+    """
+    Index of time-partitioned shards of a commit store.
+
+    Commits of every fetched hour are a contiguous range in the store
+    (see FetchManifest), so a shard of a day (or an hour) is a list
+    of such ranges. The index maps every day to its shards with their
+    numbers of commits and sizes in bytes, so that only commits of a date
+    range are read (see select()) and the shards are the units of parallel
+    reading. The index is saved into shards_by_{granularity}.json
+    in the store and extended by the entries added to the manifest since.
+    Commits of unknown hours (e.g. converted ones) are in no shard.
+    """
+
+    def __init__(self, manifest, granularity=Fetching.shard_granularity):
+        """
+        :param manifest: FetchManifest of the commit store
+        :param granularity: 'hour' or 'day' (or a coarser one)
+        """
+        self.manifest = manifest
+        self.granularity = granularity
+        self.path = manifest.store.path(f"shards_by_{granularity}.json")
+        self.shards = {}
+        # sizes of the store files after the last indexed manifest entry
+        self.sizes = {}
+        self.manifest_size = 0
+
+        if os.path.exists(self.path):
+            index = load_json(self.path)
+            if index['store'] == manifest.store.id \
+                    and index['manifest_size'] <= manifest.valid_length:
+                self.shards = index['shards']
+                self.sizes = index['sizes']
+                self.manifest_size = index['manifest_size']
+        if self.manifest_size < manifest.valid_length:
+            self.update()
+
+    def update(self):
+        """Index manifest entries added since the index was saved."""
+        for entry in self.manifest.entries(self.manifest_size):
+            if entry['hour'] != self.manifest.UNKNOWN_HOUR \
+                    and entry['end'] > entry['start']:
+                key = bucket_key(hour_time(entry['hour']), self.granularity)
+                size = sum(size - self.sizes.get(filename, 0)
+                           for filename, size in entry['sizes'].items())
+                self.shards.setdefault(key, []).append({
+                    'start': entry['start'],
+                    'end': entry['end'],
+                    'count': entry['end'] - entry['start'],
+                    'bytes': size,
+                })
+            self.sizes = entry['sizes']
+        self.manifest_size = self.manifest.valid_length
+        self.save()
+
+    def save(self):
+        if not os.path.exists(self.manifest.store.directory):
+            return
+        save_json({
+            'store': self.manifest.store.id,
+            'granularity': self.granularity,
+            'manifest_size': self.manifest_size,
+            'sizes': self.sizes,
+            'shards': self.shards,
+        }, self.path + ".part")
+        os.replace(self.path + ".part", self.path)
+
+    def select(self, since=None, until=None):
+        """
+        Find commits of a date range.
+        :param since: first date (yyyy, yyyy-mm or yyyy-mm-dd,
+            or yyyy-mm-dd-hh for the hour granularity), None means no limit
+        :param until: last date (included), in the same format as since
+        :return: sorted list of (start, end) ranges of commits in the store
+        """
+        for date in since, until:
+            if date:
+                check_date(date, self.granularity)
+
+        ranges = sorted(
+            (shard['start'], shard['end'])
+            for key, shards in self.shards.items()
+            if not since or key[:len(since)] >= since
+            if not until or key[:len(until)] <= until
+            for shard in shards)
+
+        merged = []
+        for start, end in ranges:
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def report(self):
+        """:return: list of (date, number of commits, bytes) tuples"""
+        return [(key, sum(shard['count'] for shard in shards),
+                 sum(shard['bytes'] for shard in shards))
+                for key, shards in sorted(self.shards.items())]
+
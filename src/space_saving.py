@@ -0,0 +1,82 @@
+class SpaceSaving:
+    """
+    Approximate counter of the most frequent items in bounded memory.
+
+    It's a batched variant of the Space-Saving algorithm (Metwally et al.,
+    2005). Items are counted exactly until there are twice `capacity`
+    of them, then only the `capacity` items with the highest counts are
+    kept. The highest count of a dropped item becomes the floor: an item
+    that isn't counted might have been counted up to it before, so a new
+    item starts at the floor, which is kept as its error. The true count
+    of an item is between count - error and count. The most frequent items
+    are rarely dropped, so they are counted (almost) exactly.
+    Dropping items in batches (instead of replacing the item with the lowest
+    count on every new item) keeps counting about as fast as in a dictionary.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0
+        # maximal true count of an item that isn't counted
+        self.floor = 0
+        self.counts = {}
+        self.errors = {}
+
+    def __contains__(self, item):
+        return item in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item):
+        self.total += 1
+
+        if item in self.counts:
+            self.counts[item] += 1
+            return
+
+        self.counts[item] = self.floor + 1
+        self.errors[item] = self.floor
+        if len(self.counts) >= 2 * self.capacity:
+            self.prune()
+
+    def prune(self):
+        """Keep only `capacity` items with the highest counts."""
+        if len(self.counts) <= self.capacity:
+            return
+
+        items = sorted(self.counts, key=self.counts.get, reverse=True)
+        self.floor = max(self.floor, self.counts[items[self.capacity]])
+        kept = set(items[:self.capacity])
+        self.counts = {item: count for item, count in self.counts.items()
+                       if item in kept}
+        self.errors = {item: error for item, error in self.errors.items()
+                       if item in kept}
+
+    @property
+    def error_bound(self):
+        """The maximal error of any count (including items not counted)."""
+        return self.floor
+
+    def most_common(self):
+        """:return: at most `capacity` items sorted by their counts"""
+        return sorted(self.counts, key=self.counts.get,
+                      reverse=True)[:self.capacity]
+
+    def merge(self, other):
+        """
+        Merge counts of another counter (of the same capacity).
+        An item missing in one of the counters might have been counted
+        up to its floor, so the floor is added to the count and the error.
+        """
+        items = list(self.counts) + \
+            [item for item in other.counts if item not in self.counts]
+        self.counts = {item: self.counts.get(item, self.floor) +
+                       other.counts.get(item, other.floor)
+                       for item in items}
+        self.errors = {item: self.errors.get(item, self.floor) +
+                       other.errors.get(item, other.floor)
+                       for item in items}
+        self.floor += other.floor
+        self.total += other.total
+        self.prune()
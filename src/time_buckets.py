@@ -0,0 +1,217 @@
+import calendar
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import Directories, Analyzing
+from file_utils import open_file_dir_safe
+
+# formats of bucket keys by granularity (times are in UTC)
+GRANULARITIES = {
+    'hour': "%Y-%m-%d-%H",
+    'day': "%Y-%m-%d",
+    'month': "%Y-%m",
+    'year': "%Y",
+}
+
+
+def parse_event_time(created_at):
+    """
+    Parse the time of a Github Archive event.
+    :param created_at: time in yyyy-mm-ddThh:mm:ssZ format
+    :return: Unix timestamp
+    """
+    return calendar.timegm((
+        int(created_at[0:4]), int(created_at[5:7]), int(created_at[8:10]),
+        int(created_at[11:13]), int(created_at[14:16]), int(created_at[17:19])
+    ))
+
+
+def hour_time(hour):
+    """
+    Get the time of the start of an hour.
+    :param hour: hour in yyyy-mm-dd-hh format
+    :return: Unix timestamp
+    """
+    year, month, day, hour = (int(x) for x in hour.split("-"))
+    return calendar.timegm((year, month, day, hour, 0, 0))
+
+
+def bucket_key(time, granularity):
+    return datetime.fromtimestamp(time, timezone.utc) \
+        .strftime(GRANULARITIES[granularity])
+
+
+def bucket_keys(times, granularity):
+    """
+    Get the bucket of every time.
+    Times are grouped by hours first, so that only distinct hours
+    are formatted.
+    :param times: array of Unix timestamps
+    :param granularity: one of GRANULARITIES
+    :return: tuple of (list of distinct keys in the order of their first
+        occurrence, array of indexes of the keys of the times)
+    """
+    hours = np.asarray(times, np.int64) // 3600
+    distinct_hours, first_indexes, hour_indexes = \
+        np.unique(hours, return_index=True, return_inverse=True)
+
+    keys = []
+    key_indexes = {}
+    hour_key_indexes = np.empty(len(distinct_hours), np.int64)
+    for i in np.argsort(first_indexes).tolist():
+        key = bucket_key(int(distinct_hours[i]) * 3600, granularity)
+        if key not in key_indexes:
+            key_indexes[key] = len(keys)
+            keys.append(key)
+        hour_key_indexes[i] = key_indexes[key]
+
+    return keys, hour_key_indexes[hour_indexes.reshape(-1)]
+
+
+class TimeBuckets:
+    """
+    Analyses of commits grouped into time buckets (e.g. days or months).
+
+    Every bucket has its own copies of the analyses. Only max_buckets
+    buckets are kept in memory, the least recently used ones are pickled
+    into a temporary directory (spilled) and a new partial state
+    is started when the bucket gets more commits. Partial states
+    of a bucket are merged in their order when the results are saved.
+    """
+
+    def __init__(self, empty_analyses, granularity,
+                 max_buckets=Analyzing.max_buckets):
+        """
+        :param empty_analyses: pickled analyses before analyzing anything
+        :param granularity: one of GRANULARITIES
+        :param max_buckets: maximal number of buckets kept in memory
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity},"
+                             f" use one of {', '.join(GRANULARITIES)}.")
+        self.empty_analyses = empty_analyses
+        self.granularity = granularity
+        self.max_buckets = max_buckets
+        # bucket key -> list of analyses, the least recently used first
+        self.buckets = OrderedDict()
+        # bucket key -> paths of pickled partial analyses
+        self.spilled = {}
+        self.directory = None
+
+    def keys(self):
+        return sorted(set(self.buckets) | set(self.spilled))
+
+    def analyze_batch(self, times, authors, repos, lines, messages):
+        """Run the analyses of the buckets of commits on a batch."""
+        keys, indexes = bucket_keys(times, self.granularity)
+        if len(keys) == 1:
+            self.analyze_bucket(keys[0], authors, repos, lines, messages)
+            return
+
+        for i, key in enumerate(keys):
+            selected = np.flatnonzero(indexes == i).tolist()
+            self.analyze_bucket(key,
+                                [authors[j] for j in selected],
+                                [repos[j] for j in selected],
+                                [lines[j] for j in selected],
+                                [messages[j] for j in selected])
+
+    def analyze_bucket(self, key, authors, repos, lines, messages):
+        for analysis in self.bucket(key):
+            analysis.analyze_batch(authors, repos, lines, messages)
+
+    def bucket(self, key):
+        """Get analyses of a bucket in memory, spilling others if needed."""
+        if key in self.buckets:
+            self.buckets.move_to_end(key)
+        else:
+            self.buckets[key] = pickle.loads(self.empty_analyses)
+            if len(self.buckets) > self.max_buckets:
+                self.spill()
+        return self.buckets[key]
+
+    def spill(self):
+        """Pickle the least recently used bucket into a file."""
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="buckets-")
+        key, analyses = self.buckets.popitem(last=False)
+        paths = self.spilled.setdefault(key, [])
+        path = os.path.join(self.directory, f"{key}-{len(paths)}.pickle")
+        file = open(path, 'wb')
+        with file:
+            pickle.dump(analyses, file, pickle.HIGHEST_PROTOCOL)
+        paths.append(path)
+
+    def partials(self, key):
+        """
+        Get partial analyses of a bucket in the order they were made,
+        spilled ones are loaded (and their files removed).
+        :return: generator of lists of analyses
+        """
+        for path in self.spilled.pop(key, []):
+            file = open(path, 'rb')
+            with file:
+                yield pickle.load(file)
+            os.remove(path)
+        if key in self.buckets:
+            yield self.buckets.pop(key)
+
+    def merge(self, other):
+        """
+        Merge buckets of analyses of the following commits.
+        :param other: TimeBuckets of the same analyses and granularity
+        """
+        for key in other.keys():
+            for partial in other.partials(key):
+                for analysis, partial_analysis in zip(self.bucket(key),
+                                                      partial):
+                    analysis.merge(partial_analysis)
+        other.remove_directory()
+
+    def save(self):
+        """
+        Finalize the analyses bucket by bucket and save their states
+        into outputs/json/<analysis name>_by_<granularity>.json as
+        {"granularity": ..., "buckets": {<bucket key>: <state>, ...}}.
+        The files are written bucket by bucket, so finalized states
+        of all the buckets aren't held in memory at once.
+        """
+        names = [analysis.name
+                 for analysis in pickle.loads(self.empty_analyses)]
+        files = [open_file_dir_safe(f"{Directories.json_outputs}/"
+                                    f"{name}_by_{self.granularity}.json", 'w')
+                 for name in names]
+        for file in files:
+            file.write(f'{{"granularity": "{self.granularity}",'
+                       f' "buckets": {{')
+
+        for i, key in enumerate(self.keys()):
+            analyses = None
+            for partial in self.partials(key):
+                if analyses is None:
+                    analyses = partial
+                    continue
+                for analysis, partial_analysis in zip(analyses, partial):
+                    analysis.merge(partial_analysis)
+
+            for analysis, file in zip(analyses, files):
+                analysis.finalize()
+                file.write(f'{", " if i > 0 else ""}'
+                           f'{json.dumps(key)}: {json.dumps(analysis.state)}')
+
+        for file in files:
+            file.write("}}\n")
+            file.close()
+        self.remove_directory()
+
+    def remove_directory(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None